@@ -3,6 +3,7 @@ import asyncio
 import re
 import os
 import json
+from urllib.parse import urlparse
 from telethon.sync import TelegramClient
 from telethon import errors
 from telethon.tl.types import InputPeerChannel
@@ -17,6 +18,10 @@ from rich.text import Text
 from rich.prompt import Prompt, IntPrompt, Confirm
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn
 from rich import print as rprint
+from rich.live import Live
+
+from metrics import metrics, monitoring
+from media_archive import MediaArchiver
 
 console = Console()
 
@@ -37,12 +42,55 @@ def print_banner():
 """, style="bold cyan")
     console.print(Panel(banner_text, border_style="blue", expand=False))
 
+# --- Data Extraction Patterns ---
+
+# Pattern for IP Address (IPv4) - Stricter to match valid IPs
+IP_PATTERN = re.compile(r'\b(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\b')
+
+# Pattern for links with protocol
+LINK_PATTERN = re.compile(r'https?://[^\s\[\]\(\)\{\},<>"\']+')
+
+# Pattern for domain/link
+DOMAIN_PATTERN = re.compile(r'\b(?:[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?\.)+[a-zA-Z]{2,}\b')
+
+NUMERIC_PATTERN = re.compile(r'^[0-9.]+$')
+
+def extract_entities(text):
+    """Returns (links, domains, ips) found in text. Domains are lowercased and taken from links and bare text."""
+    ips = IP_PATTERN.findall(text)
+    links = LINK_PATTERN.findall(text)
+    domains = set()
+
+    # Helper to clean and add domain
+    def add_domain(d):
+        if '.' in d and len(d) > 3 and not NUMERIC_PATTERN.match(d):
+            tld = d.split('.')[-1]
+            if tld.isalpha() and len(tld) >= 2:
+                domains.add(d.lower())
+
+    # 1. Extract domains from found links
+    for link in links:
+        try:
+            parsed = urlparse(link)
+            if parsed.netloc:
+                domain_part = parsed.netloc.split(':')[0]
+                add_domain(domain_part)
+        except:
+            pass
+
+    # 2. Extract domains directly from text
+    for domain in DOMAIN_PATTERN.findall(text):
+        add_domain(domain)
+
+    return links, domains, ips
+
 class TelegramForwarder:
-    def __init__(self, api_id, api_hash, phone_number):
+    def __init__(self, api_id, api_hash, phone_number, client=None):
         self.api_id = api_id
         self.api_hash = api_hash
         self.phone_number = phone_number
-        self.client = TelegramClient('session_' + phone_number, api_id, api_hash)
+        # An existing client can be shared (e.g. several jobs over one connection)
+        self.client = client or TelegramClient('session_' + phone_number, api_id, api_hash)
         
         # Sets to store unique extracted data
         self.unique_links = set()
@@ -92,46 +140,97 @@ class TelegramForwarder:
         if not text:
             return
 
-        # Pattern for IP Address (IPv4) - Stricter to match valid IPs
-        ip_pattern = r'\b(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\b'
-        
-        # Pattern for links with protocol
-        link_pattern = r'https?://[^\s\[\]\(\)\{\},<>"\']+'
-        
-        # Pattern for domain/link
-        domain_pattern = r'\b(?:[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?\.)+[a-zA-Z]{2,}\b'
-        
-        # Find and collect IPs
-        self.unique_ips.update(re.findall(ip_pattern, text))
-        
-        # Find and collect Links
-        found_links = re.findall(link_pattern, text)
-        self.unique_links.update(found_links)
-        
-        # Helper to clean and add domain
-        def add_domain(d):
-            if '.' in d and len(d) > 3 and not re.match(r'^[0-9.]+$', d):
-                tld = d.split('.')[-1]
-                if tld.isalpha() and len(tld) >= 2:
-                    self.unique_domains.add(d.lower())
-
-        # 1. Extract domains from found links
-        from urllib.parse import urlparse
-        for link in found_links:
+        links, domains, ips = extract_entities(text)
+        self.unique_ips.update(ips)
+        self.unique_links.update(links)
+        self.unique_domains.update(domains)
+
+    async def _iter_chat_messages(self, source_chat_id, limit=None, topic_id=None, since=None, until=None):
+        """
+        Yields messages newest-first, optionally bounded to the [since, until) date window.
+        Records fetch latency per 100-message batch and resumes after FloodWaits too long for Telethon to sleep through.
+        """
+        # If topic_id is provided, use reply_to argument to filter by topic
+        kwargs = {'limit': limit}
+        if topic_id:
+            kwargs['reply_to'] = topic_id
+        # offset_date makes Telegram start from messages older than 'until'
+        if until:
+            kwargs['offset_date'] = until
+
+        iterator = self.client.iter_messages(source_chat_id, **kwargs).__aiter__()
+        yielded = 0
+        last_id = None
+        batch_wait = 0.0
+        while True:
+            started = time.perf_counter()
             try:
-                parsed = urlparse(link)
-                if parsed.netloc:
-                    domain_part = parsed.netloc.split(':')[0]
-                    add_domain(domain_part)
-            except:
-                pass
+                message = await iterator.__anext__()
+            except StopAsyncIteration:
+                break
+            except errors.FloodWaitError as e:
+                metrics.inc("flood_waits_total")
+                metrics.inc("flood_wait_seconds_total", e.seconds)
+                print(f"FloodWait of {e.seconds}s on {source_chat_id}, resuming afterwards...")
+                await asyncio.sleep(e.seconds)
+                # Restart just below the last message we already yielded
+                if last_id:
+                    kwargs['offset_id'] = last_id
+                if limit:
+                    kwargs['limit'] = limit - yielded
+                iterator = self.client.iter_messages(source_chat_id, **kwargs).__aiter__()
+                continue
+            batch_wait += time.perf_counter() - started
 
-        # 2. Extract domains directly from text
-        raw_domains = re.findall(domain_pattern, text)
-        for domain in raw_domains:
-            add_domain(domain)
+            # History comes newest-first, so the first message older than 'since' ends the window
+            if since and message.date < since:
+                break
 
-    async def scrape_messages_to_file(self, source_chat_id, limit=None, topic_id=None, chat_title=None, topic_title=None, file_handle=None):
+            yielded += 1
+            last_id = message.id
+            if yielded % 100 == 0:
+                metrics.observe("fetch_batch_seconds", batch_wait)
+                batch_wait = 0.0
+            yield message
+
+        if yielded % 100:
+            metrics.observe("fetch_batch_seconds", batch_wait)
+
+    @staticmethod
+    def _format_sender(message):
+        sender = "Unknown"
+        if message.sender:
+            if hasattr(message.sender, 'title'): 
+                sender = message.sender.title
+            elif hasattr(message.sender, 'first_name'):
+                sender = message.sender.first_name
+                if hasattr(message.sender, 'last_name') and message.sender.last_name:
+                    sender += f" {message.sender.last_name}"
+        return sender
+
+    @staticmethod
+    def _message_record(message, chat_id, chat_title, topic_id, sender, media_key=None):
+        """Builds the JSON Lines archive record shared by scrape (jsonl) and live archiving."""
+        return {
+            "chat_id": chat_id,
+            "chat_title": chat_title,
+            "topic_id": topic_id,
+            "id": message.id,
+            "date": message.date.isoformat(),
+            "sender_id": message.sender_id,
+            "sender": sender,
+            "text": message.text or "",
+            "media": bool(message.media),
+            "media_key": media_key,
+        }
+
+    async def scrape_messages_to_file(self, source_chat_id, limit=None, topic_id=None, chat_title=None, topic_title=None, file_handle=None,
+                                      since=None, until=None, output_format="txt", output_dir=None, media_archiver=None):
+        """
+        Scrapes chat history into a text file (output_format="txt") or JSON Lines file ("jsonl").
+        With a started MediaArchiver, attachments are queued for download and referenced by their file key.
+        Returns the number of messages written, or None if the scrape failed.
+        """
         await self._ensure_authorized()
 
         # Sanitize filename helper
@@ -148,7 +247,9 @@ class TelegramForwarder:
                  filename += f"_{sanitize(topic_title)}"
             elif topic_id:
                  filename += f"_topic{topic_id}"
-            filename += ".txt"
+            filename += ".jsonl" if output_format == "jsonl" else ".txt"
+            if output_dir:
+                filename = os.path.join(output_dir, filename)
             print(f"Starting to scrape messages from {display_title} to {filename}...")
         else:
             print(f"Appending messages from {display_title} to merged file...")
@@ -161,30 +262,27 @@ class TelegramForwarder:
             
             with cm as file:
                 # If merging, add a header separator for this chat
-                if file_handle:
+                if file_handle and output_format == "txt":
                     file.write(f"\n{'='*50}\nSOURCE: {display_title}\n{'='*50}\n\n")
 
-                # If topic_id is provided, use reply_to argument to filter by topic
-                kwargs = {'limit': limit}
-                if topic_id:
-                    kwargs['reply_to'] = topic_id
+                async for message in self._iter_chat_messages(source_chat_id, limit, topic_id, since, until):
+                    sender = self._format_sender(message)
+                    media_key = await media_archiver.submit(message) if media_archiver and message.media else None
+                    write_started = time.perf_counter()
 
-                async for message in self.client.iter_messages(source_chat_id, **kwargs):
-                    date = message.date.strftime('%Y-%m-%d %H:%M:%S')
-                    
-                    sender = "Unknown"
-                    if message.sender:
-                        if hasattr(message.sender, 'title'): 
-                            sender = message.sender.title
-                        elif hasattr(message.sender, 'first_name'):
-                            sender = message.sender.first_name
-                            if hasattr(message.sender, 'last_name') and message.sender.last_name:
-                                sender += f" {message.sender.last_name}"
-                    
-                    content = message.text if message.text else "[Media/Non-text content]"
-                    
-                    file.write(f"[{date}] {sender}: {content}\n")
-                    file.write("-" * 50 + "\n")
+                    if output_format == "jsonl":
+                        record = self._message_record(message, source_chat_id, chat_title, topic_id, sender, media_key)
+                        file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    else:
+                        date = message.date.strftime('%Y-%m-%d %H:%M:%S')
+                        content = message.text if message.text else "[Media/Non-text content]"
+                        if media_key:
+                            content += f" [media:{media_key}]"
+                        
+                        file.write(f"[{date}] {sender}: {content}\n")
+                        file.write("-" * 50 + "\n")
+                    metrics.inc("write_seconds_total", time.perf_counter() - write_started)
+                    metrics.inc("scrape_messages_total")
                     
                     count += 1
                     if count % 100 == 0:
@@ -194,46 +292,64 @@ class TelegramForwarder:
                 print(f"\nSuccessfully saved {count} messages to {filename}")
             else:
                 print(f"Processed {count} messages.")
+            return count
 
         except Exception as e:
             print(f"An error occurred while scraping {source_chat_id}: {e}")
+            return None
 
-    async def extract_data_from_chat(self, source_chat_id, limit=None, topic_id=None, chat_title=None, topic_title=None):
+    async def extract_data_from_chat(self, source_chat_id, limit=None, topic_id=None, chat_title=None, topic_title=None, since=None, until=None):
+        """Collects links, domains and IPs from chat history. Returns the number of messages scanned, or None on failure."""
         await self._ensure_authorized()
         print(f"Scanning messages in {source_chat_id}{' (Topic ' + str(topic_id) + ')' if topic_id else ''}...")
         
         count = 0
         try:
-            kwargs = {'limit': limit}
-            if topic_id:
-                kwargs['reply_to'] = topic_id
-
-            async for message in self.client.iter_messages(source_chat_id, **kwargs):
+            async for message in self._iter_chat_messages(source_chat_id, limit, topic_id, since, until):
+                cpu_started = time.thread_time()
                 self._extract_and_collect_info(message.text)
+                metrics.inc("extract_cpu_seconds_total", time.thread_time() - cpu_started)
+                metrics.inc("extract_messages_total")
                 
                 count += 1
                 if count % 100 == 0:
                     print(f"Scanned {count} messages...")
                     
             print(f"Finished scanning {count} messages from {source_chat_id}")
+            return count
         except Exception as e:
             print(f"An error occurred while scanning {source_chat_id}: {e}")
+            return None
 
-    def save_extracted_data(self):
+    def save_extracted_data(self, output_dir=None, output_format="txt"):
+        """Writes collected links/domains/IPs as text files, or as a single JSON file when output_format="json"."""
         print("\nSaving extracted data...")
-        with open("links.txt", "w", encoding="utf-8") as f: 
-            for link in sorted(self.unique_links): f.write(link + "\n")
-        with open("domains.txt", "w", encoding="utf-8") as f: 
-            for domain in sorted(self.unique_domains): f.write(domain + "\n")
-        with open("ips.txt", "w", encoding="utf-8") as f: 
-            for ip in sorted(self.unique_ips): f.write(ip + "\n")
-        with open("all_results.txt", "w", encoding="utf-8") as f:
-            f.write("LINKS:\n" + "-" * 20 + "\n")
-            for link in sorted(self.unique_links): f.write(link + "\n")
-            f.write("\nDOMAINS:\n" + "-" * 20 + "\n")
-            for domain in sorted(self.unique_domains): f.write(domain + "\n")
-            f.write("\nIP ADDRESSES:\n" + "-" * 20 + "\n")
-            for ip in sorted(self.unique_ips): f.write(ip + "\n")
+
+        def out_path(name):
+            return os.path.join(output_dir, name) if output_dir else name
+
+        if output_format == "json":
+            results = {
+                "links": sorted(self.unique_links),
+                "domains": sorted(self.unique_domains),
+                "ips": sorted(self.unique_ips),
+            }
+            with open(out_path("all_results.json"), "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=4, ensure_ascii=False)
+        else:
+            with open(out_path("links.txt"), "w", encoding="utf-8") as f: 
+                for link in sorted(self.unique_links): f.write(link + "\n")
+            with open(out_path("domains.txt"), "w", encoding="utf-8") as f: 
+                for domain in sorted(self.unique_domains): f.write(domain + "\n")
+            with open(out_path("ips.txt"), "w", encoding="utf-8") as f: 
+                for ip in sorted(self.unique_ips): f.write(ip + "\n")
+            with open(out_path("all_results.txt"), "w", encoding="utf-8") as f:
+                f.write("LINKS:\n" + "-" * 20 + "\n")
+                for link in sorted(self.unique_links): f.write(link + "\n")
+                f.write("\nDOMAINS:\n" + "-" * 20 + "\n")
+                for domain in sorted(self.unique_domains): f.write(domain + "\n")
+                f.write("\nIP ADDRESSES:\n" + "-" * 20 + "\n")
+                for ip in sorted(self.unique_ips): f.write(ip + "\n")
                 
         print(f"Extracted data saved. Stats: {len(self.unique_links)} links, {len(self.unique_domains)} domains, {len(self.unique_ips)} IPs.")
 
@@ -921,385 +1037,412 @@ async def main():
             else:
                 break
 
-        # --- INNER LOOP: Main Menu for current account ---
-        switch_requested = False
-        while True:
-            print_banner()
+        # Optional metrics export for node_exporter ($MOONTELE_METRICS_FILE); stopped when the menu is left
+        async with monitoring():
+            # --- INNER LOOP: Main Menu for current account ---
+            switch_requested = False
+            while True:
+                print_banner()
             
-            # Use real name for display if available
-            menu_title = active_account.get('real_name', active_account['name'])
+                # Use real name for display if available
+                menu_title = active_account.get('real_name', active_account['name'])
             
-            # Create Menu Table
-            menu_table = Table(show_header=False, box=None, padding=(0, 2))
-            menu_table.add_column("Option", justify="right", style="cyan bold")
-            menu_table.add_column("Description", justify="left")
+                # Create Menu Table
+                menu_table = Table(show_header=False, box=None, padding=(0, 2))
+                menu_table.add_column("Option", justify="right", style="cyan bold")
+                menu_table.add_column("Description", justify="left")
             
-            menu_table.add_row("[1]", "📂 List Chats")
-            menu_table.add_row("[2]", "🔄 Forward Messages (Real-time)")
-            menu_table.add_row("[3]", "💾 Scrape Past Messages")
-            menu_table.add_row("[4]", "🔍 Extract Data (Links/IPs)")
-            menu_table.add_row("[5]", "📝 Manage Target Templates")
-            menu_table.add_row("[6]", "🚀 Send Message / Broadcast")
-            menu_table.add_row("[7]", "👥 Manage Accounts")
-            menu_table.add_row("[8]", "🚪 Exit")
-
-            # Display Info Panel
-            info_text = Text(f"Active Account: {menu_title}\nPhone: {active_account['phone']}", style="green")
-            console.print(Panel(info_text, title="[bold]Status[/bold]", border_style="green"))
-            console.print(menu_table)
-            console.print(Panel("Select an option by entering the corresponding number.", style="dim"))
+                menu_table.add_row("[1]", "📂 List Chats")
+                menu_table.add_row("[2]", "🔄 Forward Messages (Real-time)")
+                menu_table.add_row("[3]", "💾 Scrape Past Messages")
+                menu_table.add_row("[4]", "🔍 Extract Data (Links/IPs)")
+                menu_table.add_row("[5]", "📝 Manage Target Templates")
+                menu_table.add_row("[6]", "🚀 Send Message / Broadcast")
+                menu_table.add_row("[7]", "👥 Manage Accounts")
+                menu_table.add_row("[8]", "🚪 Exit")
+
+                # Display Info Panel
+                info_text = Text(f"Active Account: {menu_title}\nPhone: {active_account['phone']}", style="green")
+                console.print(Panel(info_text, title="[bold]Status[/bold]", border_style="green"))
+                console.print(menu_table)
+                console.print(Panel("Select an option by entering the corresponding number.", style="dim"))
             
-            choice = console.input("[bold yellow]❯ Enter choice: [/bold yellow]")
+                choice = console.input("[bold yellow]❯ Enter choice: [/bold yellow]")
             
-            if choice == "1":
-                dialogs = await forwarder.get_dialogs_list()
-                if dialogs:
-                    # Save to file
-                    with open(f"chats_of_{active_account['phone']}.txt", "w", encoding="utf-8") as f:
-                        for d in dialogs: f.write(f"ID: {d.id}, Title: {d.title}\n")
+                if choice == "1":
+                    dialogs = await forwarder.get_dialogs_list()
+                    if dialogs:
+                        # Save to file
+                        with open(f"chats_of_{active_account['phone']}.txt", "w", encoding="utf-8") as f:
+                            for d in dialogs: f.write(f"ID: {d.id}, Title: {d.title}\n")
                     
-                    # Create Rich Table
-                    table = Table(title=f"Chat List ({len(dialogs)} items)", box=None, padding=(0,1))
-                    table.add_column("No", justify="right", style="cyan")
-                    table.add_column("Chat Title", style="white")
-                    table.add_column("ID", style="dim")
-                    table.add_column("Type", style="yellow")
-
-                    for i, dialog in enumerate(dialogs, 1):
-                        d_type = "Forum" if getattr(dialog.entity, 'forum', False) else ("Group" if dialog.is_group else "Channel" if dialog.is_channel else "User")
-                        table.add_row(str(i), dialog.title, str(dialog.id), d_type)
-
-                    console.print(table)
-                    print(f"\n✅ List saved to 'chats_of_{active_account['phone']}.txt'")
-                    console.input("\n[dim]Press Enter to continue...[/dim]") # Tambahkan jeda di sini
-
-            elif choice == "2":
-                source_id, source_title, topic_id, topic_title = await select_chat_interactive(forwarder, "Select SOURCE Chat")
-                if source_id is None: continue
-                
-                dest_id, dest_title, _, _ = await select_chat_interactive(forwarder, "Select DESTINATION Channel")
-                if dest_id is None: continue
+                        # Create Rich Table
+                        table = Table(title=f"Chat List ({len(dialogs)} items)", box=None, padding=(0,1))
+                        table.add_column("No", justify="right", style="cyan")
+                        table.add_column("Chat Title", style="white")
+                        table.add_column("ID", style="dim")
+                        table.add_column("Type", style="yellow")
+
+                        for i, dialog in enumerate(dialogs, 1):
+                            d_type = "Forum" if getattr(dialog.entity, 'forum', False) else ("Group" if dialog.is_group else "Channel" if dialog.is_channel else "User")
+                            table.add_row(str(i), dialog.title, str(dialog.id), d_type)
 
-                k_input = input("Keywords (comma separated, or blank): ")
-                keywords = [k.strip() for k in k_input.split(",")] if k_input.strip() else []
+                        console.print(table)
+                        print(f"\n✅ List saved to 'chats_of_{active_account['phone']}.txt'")
+                        console.input("\n[dim]Press Enter to continue...[/dim]") # Tambahkan jeda di sini
+
+                elif choice == "2":
+                    source_id, source_title, topic_id, topic_title = await select_chat_interactive(forwarder, "Select SOURCE Chat")
+                    if source_id is None: continue
                 
-                print(f"\n🚀 Forwarding: {source_title} -> {dest_title}")
-                try:
-                    await forwarder.forward_messages_to_channel(source_id, dest_id, keywords, topic_id)
-                except KeyboardInterrupt:
-                    print("\nStopped.")
-
-            elif choice == "3":
-                # Reuse existing scrape logic structure
-                print("\n--- Scrape Messages ---")
-                print("1. Single Chat")
-                print("2. All Chats")
-                print("3. From Template")
-                sub_choice = input("Select source type: ")
+                    dest_id, dest_title, _, _ = await select_chat_interactive(forwarder, "Select DESTINATION Channel")
+                    if dest_id is None: continue
+
+                    k_input = input("Keywords (comma separated, or blank): ")
+                    keywords = [k.strip() for k in k_input.split(",")] if k_input.strip() else []
                 
-                targets = []
-                if sub_choice == "1":
-                    cid, ctitle, tid, ttitle = await select_chat_interactive(forwarder, "Select Chat")
-                    if cid: targets.append({'id': cid, 'title': ctitle, 'topic_id': tid, 'topic_title': ttitle})
-                elif sub_choice == "2":
-                    print("Fetching chats...")
-                    for d in await forwarder.client.get_dialogs():
-                        targets.append({'id': d.id, 'title': d.title, 'topic_id': None, 'topic_title': None})
-                elif sub_choice == "3":
-                    templates = load_templates(active_account['phone'])
-                    if templates:
-                        print("Available Templates:", ", ".join(templates.keys()))
-                        t_name = input("Enter template name: ")
-                        if t_name in templates:
-                            for item in templates[t_name]:
-                                targets.append({'id': item['chat_id'], 'title': item['chat_title'], 'topic_id': item['topic_id'], 'topic_title': item['topic_title']})
-
-                if not targets:
-                    print("❌ No targets.")
-                    continue
-
-                limit_input = input("Number of messages (0 for all): ")
-                limit = int(limit_input) if limit_input.isdigit() and limit_input != "0" else None
+                    print(f"\n🚀 Forwarding: {source_title} -> {dest_title}")
+                    try:
+                        await forwarder.forward_messages_to_channel(source_id, dest_id, keywords, topic_id)
+                    except KeyboardInterrupt:
+                        print("\nStopped.")
+
+                elif choice == "3":
+                    # Reuse existing scrape logic structure
+                    print("\n--- Scrape Messages ---")
+                    print("1. Single Chat")
+                    print("2. All Chats")
+                    print("3. From Template")
+                    sub_choice = input("Select source type: ")
                 
-                # Check merge
-                file_handle = None
-                if len(targets) > 1 and input("Merge into one file? (y/n): ").lower() == 'y':
-                    fname = input("Filename (default: merged.txt): ") or "merged.txt"
-                    file_handle = open(fname, "w", encoding="utf-8")
+                    targets = []
+                    if sub_choice == "1":
+                        cid, ctitle, tid, ttitle = await select_chat_interactive(forwarder, "Select Chat")
+                        if cid: targets.append({'id': cid, 'title': ctitle, 'topic_id': tid, 'topic_title': ttitle})
+                    elif sub_choice == "2":
+                        print("Fetching chats...")
+                        for d in await forwarder.client.get_dialogs():
+                            targets.append({'id': d.id, 'title': d.title, 'topic_id': None, 'topic_title': None})
+                    elif sub_choice == "3":
+                        templates = load_templates(active_account['phone'])
+                        if templates:
+                            print("Available Templates:", ", ".join(templates.keys()))
+                            t_name = input("Enter template name: ")
+                            if t_name in templates:
+                                for item in templates[t_name]:
+                                    targets.append({'id': item['chat_id'], 'title': item['chat_title'], 'topic_id': item['topic_id'], 'topic_title': item['topic_title']})
 
-                print(f"Starting scraping {len(targets)} targets...")
+                    if not targets:
+                        print("❌ No targets.")
+                        continue
+
+                    limit_input = input("Number of messages (0 for all): ")
+                    limit = int(limit_input) if limit_input.isdigit() and limit_input != "0" else None
                 
-                if file_handle:
-                    for t in targets:
-                        await forwarder.scrape_messages_to_file(t['id'], limit, t.get('topic_id'), chat_title=t['title'], topic_title=t.get('topic_title'), file_handle=file_handle)
-                    file_handle.close()
-                else:
-                    semaphore = asyncio.Semaphore(5)
-                    async def safe_scrape(t):
-                        async with semaphore:
-                            try: await forwarder.scrape_messages_to_file(t['id'], limit, t.get('topic_id'), chat_title=t['title'], topic_title=t.get('topic_title'))
-                            except Exception as e: print(f"Err {t['title']}: {e}")
-                    await asyncio.gather(*[safe_scrape(t) for t in targets])
+                    # Check merge
+                    file_handle = None
+                    if len(targets) > 1 and input("Merge into one file? (y/n): ").lower() == 'y':
+                        fname = input("Filename (default: merged.txt): ") or "merged.txt"
+                        file_handle = open(fname, "w", encoding="utf-8")
+
+                    # Optional media archive (deduplicated, stored under ./media)
+                    archiver = None
+                    if input("Download media too? (y/n): ").lower() == 'y':
+                        size_input = input("Max file size in MB (blank for no limit): ").strip()
+                        try:
+                            max_size = int(float(size_input) * 1024 * 1024) if size_input else None
+                        except ValueError:
+                            max_size = None
+                            console.print("[yellow]⚠️ Invalid size, downloading without a size limit.[/yellow]")
+                        types_input = input("Media types (photo,video,document,...; blank for all): ").strip()
+                        types = [x.strip() for x in types_input.split(",") if x.strip()] or None
+                        archiver = MediaArchiver(forwarder.client, max_size=max_size, types=types)
+                        await archiver.start()
+
+                    print(f"Starting scraping {len(targets)} targets...")
                 
-                print("✅ Done.")
-
-            elif choice == "4":
-                # Reuse existing extract logic structure
-                print("\n--- Extract Data ---")
-                print("1. Single Chat")
-                print("2. All Chats")
-                print("3. From Template")
-                sub_choice = input("Select source type: ")
+                    with Live(get_renderable=metrics.rich_table, console=console, refresh_per_second=2):
+                        if file_handle:
+                            for t in targets:
+                                await forwarder.scrape_messages_to_file(t['id'], limit, t.get('topic_id'), chat_title=t['title'], topic_title=t.get('topic_title'), file_handle=file_handle, media_archiver=archiver)
+                            file_handle.close()
+                        else:
+                            semaphore = asyncio.Semaphore(5)
+                            async def safe_scrape(t):
+                                async with metrics.slot(semaphore):
+                                    try: await forwarder.scrape_messages_to_file(t['id'], limit, t.get('topic_id'), chat_title=t['title'], topic_title=t.get('topic_title'), media_archiver=archiver)
+                                    except Exception as e: print(f"Err {t['title']}: {e}")
+                            await asyncio.gather(*[safe_scrape(t) for t in targets])
+
+                        if archiver:
+                            print("Waiting for media downloads to finish...")
+                            await archiver.close()
                 
-                targets = []
-                if sub_choice == "1":
-                    cid, ctitle, tid, ttitle = await select_chat_interactive(forwarder, "Select Chat")
-                    if cid: targets.append({'id': cid, 'title': ctitle, 'topic_id': tid, 'topic_title': ttitle})
-                elif sub_choice == "2":
-                    print("Fetching chats...")
-                    for d in await forwarder.client.get_dialogs():
-                        targets.append({'id': d.id, 'title': d.title, 'topic_id': None, 'topic_title': None})
-                elif sub_choice == "3":
-                    templates = load_templates(active_account['phone'])
-                    if templates:
-                        print("Available Templates:", ", ".join(templates.keys()))
-                        t_name = input("Enter template name: ")
-                        if t_name in templates:
-                            for item in templates[t_name]:
-                                targets.append({'id': item['chat_id'], 'title': item['chat_title'], 'topic_id': item['topic_id'], 'topic_title': item['topic_title']})
-
-                if targets:
-                    limit_input = input("Number of messages (0 for all): ")
-                    limit = int(limit_input) if limit_input.isdigit() and limit_input != "0" else None
+                    if archiver:
+                        st = archiver.stats
+                        print(f"🖼️ Media: {st['downloaded']} saved, {st['deduplicated']} duplicates, {st['skipped']} already archived, {st['filtered']} filtered, {st['failed']} failed.")
+                        if st['failed']:
+                            print(f"   Failed keys are listed under 'failed' in {archiver.index_path} and retried on the next scrape.")
+                    print("✅ Done.")
+
+                elif choice == "4":
+                    # Reuse existing extract logic structure
+                    print("\n--- Extract Data ---")
+                    print("1. Single Chat")
+                    print("2. All Chats")
+                    print("3. From Template")
+                    sub_choice = input("Select source type: ")
+                
+                    targets = []
+                    if sub_choice == "1":
+                        cid, ctitle, tid, ttitle = await select_chat_interactive(forwarder, "Select Chat")
+                        if cid: targets.append({'id': cid, 'title': ctitle, 'topic_id': tid, 'topic_title': ttitle})
+                    elif sub_choice == "2":
+                        print("Fetching chats...")
+                        for d in await forwarder.client.get_dialogs():
+                            targets.append({'id': d.id, 'title': d.title, 'topic_id': None, 'topic_title': None})
+                    elif sub_choice == "3":
+                        templates = load_templates(active_account['phone'])
+                        if templates:
+                            print("Available Templates:", ", ".join(templates.keys()))
+                            t_name = input("Enter template name: ")
+                            if t_name in templates:
+                                for item in templates[t_name]:
+                                    targets.append({'id': item['chat_id'], 'title': item['chat_title'], 'topic_id': item['topic_id'], 'topic_title': item['topic_title']})
+
+                    if targets:
+                        limit_input = input("Number of messages (0 for all): ")
+                        limit = int(limit_input) if limit_input.isdigit() and limit_input != "0" else None
                     
-                    semaphore = asyncio.Semaphore(5)
-                    async def safe_extract(t):
-                        async with semaphore:
-                            try: await forwarder.extract_data_from_chat(t['id'], limit, t.get('topic_id'), chat_title=t['title'], topic_title=t.get('topic_title'))
-                            except: pass
-                    await asyncio.gather(*[safe_extract(t) for t in targets])
-                    forwarder.save_extracted_data()
-                else:
-                    print("❌ No targets.")
+                        semaphore = asyncio.Semaphore(5)
+                        async def safe_extract(t):
+                            async with metrics.slot(semaphore):
+                                try: await forwarder.extract_data_from_chat(t['id'], limit, t.get('topic_id'), chat_title=t['title'], topic_title=t.get('topic_title'))
+                                except: pass
+                        with Live(get_renderable=metrics.rich_table, console=console, refresh_per_second=2):
+                            await asyncio.gather(*[safe_extract(t) for t in targets])
+                        forwarder.save_extracted_data()
+                    else:
+                        print("❌ No targets.")
 
-            elif choice == "5":
-                await manage_templates(forwarder, active_account['phone'])
+                elif choice == "5":
+                    await manage_templates(forwarder, active_account['phone'])
 
-            elif choice == "6":
-                print_banner()
-                console.print(Panel("[1] Single Chat (One time)\n[2] From Template (Bulk)", title="🚀 Broadcast Target Selection", border_style="blue"))
-                sub_choice = console.input("[bold yellow]❯ Choice: [/bold yellow]")
-                targets = []
+                elif choice == "6":
+                    print_banner()
+                    console.print(Panel("[1] Single Chat (One time)\n[2] From Template (Bulk)", title="🚀 Broadcast Target Selection", border_style="blue"))
+                    sub_choice = console.input("[bold yellow]❯ Choice: [/bold yellow]")
+                    targets = []
                 
-                if sub_choice == "1":
-                    cid, ctitle, tid, ttitle = await select_chat_interactive(forwarder, "Select Target")
-                    if cid: targets.append({'id': cid, 'title': ctitle, 'topic_id': tid, 'topic_title': ttitle})
+                    if sub_choice == "1":
+                        cid, ctitle, tid, ttitle = await select_chat_interactive(forwarder, "Select Target")
+                        if cid: targets.append({'id': cid, 'title': ctitle, 'topic_id': tid, 'topic_title': ttitle})
                 
-                elif sub_choice == "2":
-                    templates = load_templates(active_account['phone'])
-                    if templates:
-                        # Template Table
-                        table = Table(title="Available Templates", box=None)
-                        table.add_column("No", style="cyan", justify="right")
-                        table.add_column("Name", style="white")
-                        table.add_column("Targets", style="green")
+                    elif sub_choice == "2":
+                        templates = load_templates(active_account['phone'])
+                        if templates:
+                            # Template Table
+                            table = Table(title="Available Templates", box=None)
+                            table.add_column("No", style="cyan", justify="right")
+                            table.add_column("Name", style="white")
+                            table.add_column("Targets", style="green")
                         
-                        template_keys = list(templates.keys())
-                        for i, key in enumerate(template_keys, 1):
-                            table.add_row(str(i), key, str(len(templates[key])))
-                        console.print(table)
+                            template_keys = list(templates.keys())
+                            for i, key in enumerate(template_keys, 1):
+                                table.add_row(str(i), key, str(len(templates[key])))
+                            console.print(table)
                         
-                        try:
-                            t_idx_input = console.input("[bold yellow]❯ Enter number of template to use: [/bold yellow]")
-                            t_idx = int(t_idx_input)
-                            if 1 <= t_idx <= len(template_keys):
-                                t_name = template_keys[t_idx-1]
-                                for item in templates[t_name]:
-                                    targets.append({'id': item['chat_id'], 'title': item['chat_title'], 'topic_id': item['topic_id'], 'topic_title': item['topic_title']})
-                                console.print(f"[green]✅ Loaded {len(targets)} targets from '{t_name}'[/green]")
-                            else:
-                                console.print("[red]❌ Invalid template number.[/red]")
-                        except ValueError:
-                            console.print("[red]❌ Invalid input.[/red]")
-                    else:
-                        console.print("[yellow]⚠️ No templates found for this account.[/yellow]")
+                            try:
+                                t_idx_input = console.input("[bold yellow]❯ Enter number of template to use: [/bold yellow]")
+                                t_idx = int(t_idx_input)
+                                if 1 <= t_idx <= len(template_keys):
+                                    t_name = template_keys[t_idx-1]
+                                    for item in templates[t_name]:
+                                        targets.append({'id': item['chat_id'], 'title': item['chat_title'], 'topic_id': item['topic_id'], 'topic_title': item['topic_title']})
+                                    console.print(f"[green]✅ Loaded {len(targets)} targets from '{t_name}'[/green]")
+                                else:
+                                    console.print("[red]❌ Invalid template number.[/red]")
+                            except ValueError:
+                                console.print("[red]❌ Invalid input.[/red]")
+                        else:
+                            console.print("[yellow]⚠️ No templates found for this account.[/yellow]")
                 
-                if targets:
-                    console.print(Panel("[1] Manual Input (Type here)\n[2] Read from File (.txt)\n[3] Forward Message (Recommended)", title="Select Message Source", border_style="blue"))
-                    msg_choice = console.input("[bold yellow]❯ Select source: [/bold yellow]")
+                    if targets:
+                        console.print(Panel("[1] Manual Input (Type here)\n[2] Read from File (.txt)\n[3] Forward Message (Recommended)", title="Select Message Source", border_style="blue"))
+                        msg_choice = console.input("[bold yellow]❯ Select source: [/bold yellow]")
                     
-                    message_text = None
-                    message_object = None
+                        message_text = None
+                        message_object = None
                     
-                    if msg_choice == "1":
-                        console.print("[cyan]Enter your message (press Enter twice to finish):[/cyan]")
-                        lines = []
-                        while True:
-                            line = input()
-                            if not line: break
-                            lines.append(line)
-                        message_text = "\n".join(lines)
+                        if msg_choice == "1":
+                            console.print("[cyan]Enter your message (press Enter twice to finish):[/cyan]")
+                            lines = []
+                            while True:
+                                line = input()
+                                if not line: break
+                                lines.append(line)
+                            message_text = "\n".join(lines)
                     
-                    elif msg_choice == "2":
-                        fname = console.input("[bold yellow]Enter filename (e.g. ad.txt): [/bold yellow]")
-                        try:
-                            with open(fname, 'r', encoding='utf-8') as f:
-                                message_text = f.read()
-                            console.print(f"[green]✅ Loaded {len(message_text)} chars from file.[/green]")
-                        except Exception as e:
-                            console.print(f"[red]❌ Error reading file: {e}[/red]")
+                        elif msg_choice == "2":
+                            fname = console.input("[bold yellow]Enter filename (e.g. ad.txt): [/bold yellow]")
+                            try:
+                                with open(fname, 'r', encoding='utf-8') as f:
+                                    message_text = f.read()
+                                console.print(f"[green]✅ Loaded {len(message_text)} chars from file.[/green]")
+                            except Exception as e:
+                                console.print(f"[red]❌ Error reading file: {e}[/red]")
                     
-                    elif msg_choice == "3":
-                        console.print(Panel("""[bold]Instruksi Forward Pesan[/bold]
+                        elif msg_choice == "3":
+                            console.print(Panel("""[bold]Instruksi Forward Pesan[/bold]
 1. Salin tautan/link pesan Telegram yang ingin diteruskan.
 2. Dukungan: Teks, Foto, Video, Album, dan File.
 3. Contoh Link: https://t.me/channel_name/1234""", border_style="cyan"))
                         
-                        link = console.input("[bold yellow]❯ Masukkan Link Pesan: [/bold yellow]").strip()
-                        try:
-                            if "t.me/" not in link:
-                                console.print("[red]❌ Invalid link format.[/red]")
-                            else:
-                                link = link.split("?")[0]
-                                parts = link.split("/")
-                                msg_id = int(parts[-1])
-                                
-                                chat_identifier = None
-                                if "/c/" in link:
-                                    try:
-                                        c_index = parts.index("c")
-                                        raw_id = parts[c_index + 1]
-                                        chat_identifier = int(f"-100{raw_id}")
-                                    except: pass
+                            link = console.input("[bold yellow]❯ Masukkan Link Pesan: [/bold yellow]").strip()
+                            try:
+                                if "t.me/" not in link:
+                                    console.print("[red]❌ Invalid link format.[/red]")
                                 else:
-                                    t_index = parts.index("t.me")
-                                    chat_identifier = parts[t_index + 1]
+                                    link = link.split("?")[0]
+                                    parts = link.split("/")
+                                    msg_id = int(parts[-1])
                                 
-                                if chat_identifier:
-                                    print(f"🔄 Fetching message {msg_id}...")
-                                    # Fetch primary message
-                                    primary_msg = await forwarder.client.get_messages(chat_identifier, ids=msg_id)
-                                    
-                                    if not primary_msg:
-                                        print("❌ Message not found or access denied.")
-                                        message_object = None
+                                    chat_identifier = None
+                                    if "/c/" in link:
+                                        try:
+                                            c_index = parts.index("c")
+                                            raw_id = parts[c_index + 1]
+                                            chat_identifier = int(f"-100{raw_id}")
+                                        except: pass
                                     else:
-                                        # Check for Album (Grouped Media)
-                                        if primary_msg.grouped_id:
-                                            print(f"📦 Detected Album (ID: {primary_msg.grouped_id}). Fetching all parts...")
-                                            # Fetch surrounding messages to find the rest of the album
-                                            # Albums are usually consecutive, scanning +/- 9 IDs should cover it (max album size is 10)
-                                            surrounding_ids = list(range(msg_id - 9, msg_id + 10))
-                                            msgs = await forwarder.client.get_messages(chat_identifier, ids=surrounding_ids)
+                                        t_index = parts.index("t.me")
+                                        chat_identifier = parts[t_index + 1]
+                                
+                                    if chat_identifier:
+                                        print(f"🔄 Fetching message {msg_id}...")
+                                        # Fetch primary message
+                                        primary_msg = await forwarder.client.get_messages(chat_identifier, ids=msg_id)
+                                    
+                                        if not primary_msg:
+                                            print("❌ Message not found or access denied.")
+                                            message_object = None
+                                        else:
+                                            # Check for Album (Grouped Media)
+                                            if primary_msg.grouped_id:
+                                                print(f"📦 Detected Album (ID: {primary_msg.grouped_id}). Fetching all parts...")
+                                                # Fetch surrounding messages to find the rest of the album
+                                                # Albums are usually consecutive, scanning +/- 9 IDs should cover it (max album size is 10)
+                                                surrounding_ids = list(range(msg_id - 9, msg_id + 10))
+                                                msgs = await forwarder.client.get_messages(chat_identifier, ids=surrounding_ids)
                                             
-                                            # Filter messages belonging to the same group
-                                            album_messages = [m for m in msgs if m and m.grouped_id == primary_msg.grouped_id]
-                                            album_messages.sort(key=lambda x: x.id)
+                                                # Filter messages belonging to the same group
+                                                album_messages = [m for m in msgs if m and m.grouped_id == primary_msg.grouped_id]
+                                                album_messages.sort(key=lambda x: x.id)
                                             
-                                            if album_messages:
-                                                message_object = album_messages
-                                                print(f"✅ Album fetched: {len(album_messages)} items.")
+                                                if album_messages:
+                                                    message_object = album_messages
+                                                    print(f"✅ Album fetched: {len(album_messages)} items.")
+                                                else:
+                                                    message_object = primary_msg
+                                                    print("⚠️ Failed to group album, using single message.")
                                             else:
+                                                # Single Message
                                                 message_object = primary_msg
-                                                print("⚠️ Failed to group album, using single message.")
-                                        else:
-                                            # Single Message
-                                            message_object = primary_msg
-                                            print("✅ Message fetched successfully!")
-                                else:
-                                    print("❌ Could not parse chat ID.")
-                        except Exception as e:
-                            print(f"❌ Error: {e}")
+                                                print("✅ Message fetched successfully!")
+                                    else:
+                                        print("❌ Could not parse chat ID.")
+                            except Exception as e:
+                                print(f"❌ Error: {e}")
 
-                    if not message_text and not message_object:
-                        console.print("[red]❌ No valid message to send.[/red]")
-                    else:
-                        # --- Mode Selection (Only for Message Objects/Links) ---
-                        send_as_forward = False
-                        if message_object:
-                            console.print(Panel("[1] Send as Copy (Clean, No Tag)\n[2] Forward (With Tag & Views, Trusted)", title="Forwarding Mode", border_style="cyan"))
-                            mode_input = console.input("[bold yellow]❯ Select Mode (Default 1): [/bold yellow]")
-                            if mode_input == "2":
-                                send_as_forward = True
-                                console.print("[green]✅ Mode: True Forward (Tag enabled)[/green]")
-                            else:
-                                console.print("[green]✅ Mode: Send as Copy (Clean)[/green]")
+                        if not message_text and not message_object:
+                            console.print("[red]❌ No valid message to send.[/red]")
+                        else:
+                            # --- Mode Selection (Only for Message Objects/Links) ---
+                            send_as_forward = False
+                            if message_object:
+                                console.print(Panel("[1] Send as Copy (Clean, No Tag)\n[2] Forward (With Tag & Views, Trusted)", title="Forwarding Mode", border_style="cyan"))
+                                mode_input = console.input("[bold yellow]❯ Select Mode (Default 1): [/bold yellow]")
+                                if mode_input == "2":
+                                    send_as_forward = True
+                                    console.print("[green]✅ Mode: True Forward (Tag enabled)[/green]")
+                                else:
+                                    console.print("[green]✅ Mode: Send as Copy (Clean)[/green]")
                         
-                        console.print(f"\n[green]🚀 Ready to send to {len(targets)} targets.[/green]")
+                            console.print(f"\n[green]🚀 Ready to send to {len(targets)} targets.[/green]")
                         
-                        console.print(Panel("""[bold white]Delay Settings[/bold white]
+                            console.print(Panel("""[bold white]Delay Settings[/bold white]
 Set a delay between messages to avoid spam detection.
 [yellow]Recommended: 3-5 seconds[/yellow]""", border_style="yellow"))
                         
-                        delay_input = console.input("[bold yellow]   Enter delay (seconds) [Default: 5]: [/bold yellow]")
-                        try:
-                            delay = float(delay_input) if delay_input else 5.0
-                        except ValueError:
-                            delay = 5.0
+                            delay_input = console.input("[bold yellow]   Enter delay (seconds) [Default: 5]: [/bold yellow]")
+                            try:
+                                delay = float(delay_input) if delay_input else 5.0
+                            except ValueError:
+                                delay = 5.0
                         
-                        console.print(f"[green]✅ Using delay: {delay}s[/green]")
+                            console.print(f"[green]✅ Using delay: {delay}s[/green]")
 
-                        if Confirm.ask("Start Broadcast?", default=True):
-                            print_banner()
-                            console.print(f"[bold cyan]🚀 Broadcasting to {len(targets)} targets...[/bold cyan]\n")
+                            if Confirm.ask("Start Broadcast?", default=True):
+                                print_banner()
+                                console.print(f"[bold cyan]🚀 Broadcasting to {len(targets)} targets...[/bold cyan]\n")
                             
-                            with Progress(
-                                SpinnerColumn(),
-                                TextColumn("[progress.description]{task.description}"),
-                                BarColumn(),
-                                TaskProgressColumn(),
-                                console=console
-                            ) as progress:
-                                task_id = progress.add_task("[cyan]Starting...", total=len(targets))
+                                with Progress(
+                                    SpinnerColumn(),
+                                    TextColumn("[progress.description]{task.description}"),
+                                    BarColumn(),
+                                    TaskProgressColumn(),
+                                    console=console
+                                ) as progress:
+                                    task_id = progress.add_task("[cyan]Starting...", total=len(targets))
                                 
-                                for i, t in enumerate(targets, 1):
-                                    chat_name = t['title'][:30]
-                                    progress.update(task_id, description=f"[cyan]Sending to {chat_name}...")
+                                    for i, t in enumerate(targets, 1):
+                                        chat_name = t['title'][:30]
+                                        progress.update(task_id, description=f"[cyan]Sending to {chat_name}...")
                                     
-                                    if message_object:
-                                        await forwarder.forward_existing_message(
-                                            t['id'], message_object, 
-                                            topic_id=t.get('topic_id'), 
-                                            chat_title=t['title'], 
-                                            topic_title=t.get('topic_title'),
-                                            as_forward=send_as_forward
-                                        )
-                                    else:
-                                        await forwarder.send_custom_message(
-                                            t['id'], message_text, 
-                                            topic_id=t.get('topic_id'), 
-                                            chat_title=t['title'], 
-                                            topic_title=t.get('topic_title')
-                                        )
+                                        if message_object:
+                                            await forwarder.forward_existing_message(
+                                                t['id'], message_object, 
+                                                topic_id=t.get('topic_id'), 
+                                                chat_title=t['title'], 
+                                                topic_title=t.get('topic_title'),
+                                                as_forward=send_as_forward
+                                            )
+                                        else:
+                                            await forwarder.send_custom_message(
+                                                t['id'], message_text, 
+                                                topic_id=t.get('topic_id'), 
+                                                chat_title=t['title'], 
+                                                topic_title=t.get('topic_title')
+                                            )
                                     
-                                    # Update progress
-                                    progress.advance(task_id)
-                                    await asyncio.sleep(delay)
+                                        # Update progress
+                                        progress.advance(task_id)
+                                        await asyncio.sleep(delay)
                                 
-                            console.print("\n[bold green]✅ Broadcast complete![/bold green]")
-                            time.sleep(2)
-                        else:
-                            console.print("[yellow]Cancelled.[/yellow]")
-                else:
-                    print("❌ No targets.")
-
-            elif choice == "7":
-                accounts, new_acc = await manage_accounts_menu(accounts, active_account)
-                if new_acc:
-                    # User requested to switch
-                    print(f"👋 Disconnecting {active_account['name']}...")
+                                console.print("\n[bold green]✅ Broadcast complete![/bold green]")
+                                time.sleep(2)
+                            else:
+                                console.print("[yellow]Cancelled.[/yellow]")
+                    else:
+                        print("❌ No targets.")
+
+                elif choice == "7":
+                    accounts, new_acc = await manage_accounts_menu(accounts, active_account)
+                    if new_acc:
+                        # User requested to switch
+                        print(f"👋 Disconnecting {active_account['name']}...")
+                        await forwarder.client.disconnect()
+                        active_account = new_acc
+                        switch_requested = True
+                        break # Break inner loop to restart outer loop with new account
+
+                elif choice == "8":
+                    print("👋 Exiting...")
                     await forwarder.client.disconnect()
-                    active_account = new_acc
-                    switch_requested = True
-                    break # Break inner loop to restart outer loop with new account
+                    return
 
-            elif choice == "8":
-                print("👋 Exiting...")
-                await forwarder.client.disconnect()
-                return
-
-            else:
-                print("Invalid choice")
+                else:
+                    print("Invalid choice")
         
         if not switch_requested:
             # If inner loop broke but not for switch (e.g. error), exit outer too
@@ -0,0 +1,361 @@
+import os
+import sys
+import csv
+import json
+import glob
+import time
+import argparse
+from array import array
+from datetime import datetime, timezone
+
+from rich.console import Console
+from rich.table import Table
+
+from MoonTele import extract_entities
+
+# NumPy is only needed for analytics
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+console = Console()
+
+META_FILE = "meta.json"
+COLUMNS = ("chat", "sender", "ts", "dom_chat", "dom_ts", "dom_idx")
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+SECONDS_PER_DAY = 86400
+
+
+class Archive:
+    """
+    Columnar view of archived messages: one row per message in `chat`/`sender`/`ts` (int32/int32/int64 UTC seconds)
+    and one row per (message, domain) pair in `dom_chat`/`dom_ts`/`dom_idx`. Integer columns index into the
+    chats/senders/domains lookup lists kept in `meta`.
+    """
+    def __init__(self, columns, meta):
+        self.meta = meta
+        for name in COLUMNS:
+            setattr(self, name, columns[name])
+        self.chats = meta["chats"]
+        self.senders = meta["senders"]
+        self.domains = meta["domains"]
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in COLUMNS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        """Opens a store written by save(); columns are memory-mapped, so only the pages a report touches are read."""
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in COLUMNS}
+        return cls(columns, meta)
+
+
+def archive_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.jsonl"))))
+        else:
+            files.append(path)
+    return files
+
+
+def build_archive(paths):
+    """
+    Parses JSON Lines archives (scrape jsonl output and live_archive.py files) into columns.
+    Each message is counted once: repeated 'new' records are collapsed, edits are ignored and deleted messages dropped.
+    """
+    chat_ids, senders, domains = {}, {}, {}
+    chat_titles, sender_names = [], []
+
+    chat_col, sender_col, ts_col, key_col = array("i"), array("i"), array("q"), array("q")
+    dom_row, dom_col = array("q"), array("i")
+    deleted = array("q")
+
+    for path in archive_files(paths):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                event = rec.get("event", "new")
+                if event == "edit":
+                    continue
+
+                chat_id = rec["chat_id"]
+                if chat_id not in chat_ids:
+                    chat_ids[chat_id] = len(chat_titles)
+                    chat_titles.append([chat_id, rec.get("chat_title") or str(chat_id)])
+                c = chat_ids[chat_id]
+                key = (c << 32) | (rec["id"] & 0xFFFFFFFF)
+
+                if event == "delete":
+                    deleted.append(key)
+                    continue
+
+                sender_id = rec.get("sender_id")
+                if sender_id not in senders:
+                    senders[sender_id] = len(sender_names)
+                    sender_names.append([sender_id, rec.get("sender") or "Unknown"])
+
+                row = len(ts_col)
+                chat_col.append(c)
+                sender_col.append(senders[sender_id])
+                ts_col.append(int(datetime.fromisoformat(rec["date"]).timestamp()))
+                key_col.append(key)
+
+                text = rec.get("text")
+                if text:
+                    for domain in extract_entities(text)[1]:
+                        if domain not in domains:
+                            domains[domain] = len(domains)
+                        dom_row.append(row)
+                        dom_col.append(domains[domain])
+
+    chat = np.frombuffer(chat_col, dtype=np.int32)
+    sender = np.frombuffer(sender_col, dtype=np.int32)
+    ts = np.frombuffer(ts_col, dtype=np.int64)
+    keys = np.frombuffer(key_col, dtype=np.int64)
+    rows = np.frombuffer(dom_row, dtype=np.int64)
+    dom_idx = np.frombuffer(dom_col, dtype=np.int32)
+
+    # Keep the first record of every message that was not deleted afterwards
+    keep = np.zeros(len(keys), dtype=bool)
+    keep[np.unique(keys, return_index=True)[1]] = True
+    if len(deleted):
+        keep &= ~np.isin(keys, np.frombuffer(deleted, dtype=np.int64))
+    dom_keep = keep[rows]
+
+    columns = {
+        "chat": chat[keep], "sender": sender[keep], "ts": ts[keep],
+        "dom_chat": chat[rows[dom_keep]], "dom_ts": ts[rows[dom_keep]], "dom_idx": dom_idx[dom_keep],
+    }
+    meta = {
+        "built_at": datetime.now(timezone.utc).isoformat(),
+        "messages": int(keep.sum()),
+        "chats": chat_titles,
+        "senders": sender_names,
+        "domains": list(domains),
+    }
+    return Archive(columns, meta)
+
+
+def open_archive(paths):
+    if len(paths) == 1 and os.path.exists(os.path.join(paths[0], META_FILE)):
+        return Archive.load(paths[0])
+    return build_archive(paths)
+
+
+# --- Vectorized Reports ---
+
+def parse_ts(value):
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def window_mask(archive, ts, chat, args):
+    """Boolean mask for the --chat / --since / --until filters (None when nothing is filtered)."""
+    mask = None
+
+    def add(m):
+        nonlocal mask
+        mask = m if mask is None else mask & m
+
+    if args.chat is not None:
+        idx = next((i for i, (cid, _) in enumerate(archive.chats) if cid == args.chat), None)
+        add(chat == (idx if idx is not None else -1))
+    if args.since:
+        add(ts >= parse_ts(args.since))
+    if args.until:
+        add(ts < parse_ts(args.until))
+    return mask
+
+
+def message_columns(archive, args):
+    chat, sender, ts = archive.chat, archive.sender, archive.ts
+    mask = window_mask(archive, ts, chat, args)
+    if mask is not None:
+        chat, sender, ts = chat[mask], sender[mask], ts[mask]
+    # Shift to local time for day/hour bucketing
+    return chat, sender, ts + int(args.tz_offset * 3600)
+
+
+def top_n(counts, n):
+    nonzero = np.flatnonzero(counts)
+    order = nonzero[np.argsort(-counts[nonzero], kind="stable")]
+    return order[:n] if n else order
+
+
+def fmt_day(day):
+    return datetime.fromtimestamp(int(day) * SECONDS_PER_DAY, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def report_chats(archive, args):
+    chat, sender, ts = message_columns(archive, args)
+    n = len(archive.chats)
+    counts = np.bincount(chat, minlength=n)
+
+    # Distinct senders per chat: unique (chat, sender) pairs counted per chat
+    pairs = np.unique(chat.astype(np.int64) * max(len(archive.senders), 1) + sender)
+    distinct = np.bincount(pairs // max(len(archive.senders), 1), minlength=n)
+
+    first = np.full(n, np.iinfo(np.int64).max)
+    last = np.full(n, np.iinfo(np.int64).min)
+    np.minimum.at(first, chat, ts)
+    np.maximum.at(last, chat, ts)
+
+    rows = []
+    for i in top_n(counts, args.top):
+        rows.append([archive.chats[i][1], archive.chats[i][0], int(counts[i]), int(distinct[i]),
+                     fmt_day(first[i] // SECONDS_PER_DAY), fmt_day(last[i] // SECONDS_PER_DAY)])
+    return "Messages per Chat", ["Chat", "ID", "Messages", "Senders", "First", "Last"], rows
+
+
+def report_senders(archive, args):
+    _, sender, _ = message_columns(archive, args)
+    counts = np.bincount(sender, minlength=len(archive.senders))
+    total = max(int(counts.sum()), 1)
+    rows = [[archive.senders[i][1], archive.senders[i][0], int(counts[i]), f"{counts[i] * 100 / total:.2f}%"]
+            for i in top_n(counts, args.top)]
+    return "Messages per Sender", ["Sender", "ID", "Messages", "Share"], rows
+
+
+def report_daily(archive, args):
+    _, _, ts = message_columns(archive, args)
+    days, counts = np.unique(ts // SECONDS_PER_DAY, return_counts=True)
+    return "Messages per Day", ["Day", "Messages"], [[fmt_day(d), int(c)] for d, c in zip(days, counts)]
+
+
+def report_heatmap(archive, args):
+    _, _, ts = message_columns(archive, args)
+    days = ts // SECONDS_PER_DAY
+    weekday = (days + 3) % 7  # 1970-01-01 was a Thursday
+    hour = (ts // 3600) % 24
+    grid = np.bincount(weekday * 24 + hour, minlength=7 * 24).reshape(7, 24)
+    # Hours as rows keep the table within terminal width
+    rows = [[f"{h:02d}:00"] + [int(x) for x in grid[:, h]] for h in range(24)]
+    return "Hourly Activity (hour x weekday)", ["Hour"] + list(WEEKDAYS), rows
+
+
+def period_index(ts, period):
+    seconds = ts.astype("datetime64[s]")
+    if period == "month":
+        return seconds.astype("datetime64[M]").astype(np.int64), lambda p: str(np.datetime64(int(p), "M"))
+    if period == "week":
+        # Weeks start on Monday: shift so day 0 (Thursday) lands mid-week
+        weeks = (ts // SECONDS_PER_DAY + 3) // 7
+        return weeks, lambda w: fmt_day(int(w) * 7 - 3)
+    return ts // SECONDS_PER_DAY, fmt_day
+
+
+def report_domains(archive, args):
+    chat, ts, dom = archive.dom_chat, archive.dom_ts, archive.dom_idx
+    mask = window_mask(archive, ts, chat, args)
+    if mask is not None:
+        chat, ts, dom = chat[mask], ts[mask], dom[mask]
+    if not len(dom):
+        return "Top Domains", ["Chat", "Period", "Rank", "Domain", "Mentions"], []
+
+    periods, fmt_period = period_index(ts + int(args.tz_offset * 3600), args.period)
+    p0 = periods.min()
+    n_periods = int(periods.max() - p0 + 1)
+    n_domains = max(len(archive.domains), 1)
+
+    # Count (chat, period, domain) triples through one combined integer key
+    group = chat.astype(np.int64) * n_periods + (periods - p0)
+    keys, counts = np.unique(group * n_domains + dom, return_counts=True)
+    groups, domains = keys // n_domains, keys % n_domains
+
+    # Rank domains inside each (chat, period) group by count, descending
+    order = np.lexsort((-counts, groups))
+    groups, domains, counts = groups[order], domains[order], counts[order]
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    rank = np.arange(len(groups)) - np.repeat(starts, np.diff(np.r_[starts, len(groups)]))
+    top = rank < (args.top or 10)
+
+    rows = []
+    for g, d, c, r in zip(groups[top], domains[top], counts[top], rank[top]):
+        chat_idx, period = divmod(int(g), n_periods)
+        rows.append([archive.chats[chat_idx][1], fmt_period(period + p0), int(r) + 1, archive.domains[d], int(c)])
+    return f"Top Domains per Chat per {args.period.capitalize()}", ["Chat", "Period", "Rank", "Domain", "Mentions"], rows
+
+
+REPORTS = {
+    "chats": report_chats,
+    "senders": report_senders,
+    "daily": report_daily,
+    "heatmap": report_heatmap,
+    "domains": report_domains,
+}
+
+
+def emit(title, headers, rows, csv_path=None):
+    if csv_path:
+        f = sys.stdout if csv_path == "-" else open(csv_path, "w", encoding="utf-8", newline="")
+        try:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(rows)
+        finally:
+            if f is not sys.stdout:
+                f.close()
+        return
+
+    table = Table(title=title, box=None, padding=(0, 1))
+    for i, header in enumerate(headers):
+        table.add_column(header, style="cyan" if i == 0 else "white", justify="left" if i == 0 else "right")
+    for row in rows:
+        table.add_row(*[str(x) for x in row])
+    console.print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized activity reports over archived history (JSON Lines archives).")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Convert JSON Lines archives into a memory-mappable columnar store")
+    build.add_argument("paths", nargs="+", help="Archive .jsonl files or directories")
+    build.add_argument("--store", required=True, help="Output directory for the columnar store")
+
+    report = sub.add_parser("report", help="Print a report from a columnar store or directly from .jsonl archives")
+    report.add_argument("report", choices=sorted(REPORTS))
+    report.add_argument("paths", nargs="+", help="A store directory, or archive .jsonl files/directories")
+    report.add_argument("--chat", type=int, help="Only this chat ID")
+    report.add_argument("--since", help="ISO date/datetime (UTC), inclusive")
+    report.add_argument("--until", help="ISO date/datetime (UTC), exclusive")
+    report.add_argument("--top", type=int, default=20, help="Rows per report (domains: per chat and period); 0 = all")
+    report.add_argument("--period", choices=["day", "week", "month"], default="month", help="Time bucket for the domains report")
+    report.add_argument("--tz-offset", type=float, default=0.0, help="Hours added to UTC for day/hour bucketing (e.g. 7 for WIB)")
+    report.add_argument("--csv", help="Write CSV to this file ('-' for stdout) instead of a table")
+    args = parser.parse_args()
+
+    if np is None:
+        print("❌ analytics.py needs NumPy: pip install -r requirements.txt")
+        sys.exit(2)
+
+    started = time.perf_counter()
+    if args.command == "build":
+        archive = build_archive(args.paths)
+        archive.save(args.store)
+        console.print(f"[green]✅ Stored {archive.meta['messages']} messages, {len(archive.chats)} chats, "
+                      f"{len(archive.domains)} domains in {args.store} ({time.perf_counter() - started:.1f}s)[/green]")
+        return
+
+    archive = open_archive(args.paths)
+    title, headers, rows = REPORTS[args.report](archive, args)
+    emit(title, headers, rows, args.csv)
+    if args.csv != "-":
+        console.print(f"[dim]{archive.meta['messages']} messages, {time.perf_counter() - started:.2f}s[/dim]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+from MoonTele import TelegramForwarder, load_accounts, load_templates
+from metrics import metrics, monitoring
+from media_archive import MediaArchiver
+
+# PyYAML is optional: JSON manifests always work
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+JOB_TYPES = ("scrape", "extract")
+SCRAPE_FORMATS = ("txt", "jsonl")
+EXTRACT_FORMATS = ("txt", "json")
+DEFAULT_CONCURRENCY = 5
+
+
+class ManifestError(Exception):
+    pass
+
+
+def load_manifest(path):
+    """Reads a JSON or YAML job manifest and returns it as a dict."""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.lower().endswith((".yml", ".yaml")):
+            if yaml is None:
+                raise ManifestError("YAML manifest given but PyYAML is not installed (pip install pyyaml)")
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+
+    if not isinstance(data, dict) or not isinstance(data.get("jobs"), list):
+        raise ManifestError("Manifest must be an object with a 'jobs' list")
+
+    output_dirs = {}
+    for i, job in enumerate(data["jobs"], 1):
+        if not isinstance(job, dict):
+            raise ManifestError(f"Job #{i}: must be an object")
+        job.setdefault("name", f"job{i}")
+        if not isinstance(job["name"], str) or not job["name"].strip():
+            raise ManifestError(f"Job #{i}: 'name' must be a non-empty string")
+        if job.get("type") not in JOB_TYPES:
+            raise ManifestError(f"Job #{i}: 'type' must be one of {', '.join(JOB_TYPES)}")
+        if "targets" not in job:
+            raise ManifestError(f"Job #{i}: 'targets' is required")
+        formats = SCRAPE_FORMATS if job["type"] == "scrape" else EXTRACT_FORMATS
+        if job.get("format", "txt") not in formats:
+            raise ManifestError(f"Job #{i}: 'format' must be one of {', '.join(formats)}")
+
+        # Bad values must fail here, before any job has started writing files
+        limit = job.get("limit")
+        if limit is not None and (isinstance(limit, bool) or not isinstance(limit, int) or limit < 0):
+            raise ManifestError(f"Job #{i}: 'limit' must be a non-negative integer (0 or null for all history)")
+        for key in ("since", "until"):
+            try:
+                job[key] = parse_date(job.get(key))
+            except (TypeError, ValueError):
+                raise ManifestError(f"Job #{i}: '{key}' is not an ISO date: {job.get(key)!r}")
+        if job["since"] and job["until"] and job["since"] >= job["until"]:
+            raise ManifestError(f"Job #{i}: 'since' must be before 'until'")
+
+        # Jobs run concurrently, so each needs its own directory or their files overwrite each other
+        out_dir = os.path.abspath(job_output_dir(job))
+        if out_dir in output_dirs:
+            raise ManifestError(f"Job #{i} ('{job['name']}') writes to the same directory as job '{output_dirs[out_dir]}': {out_dir}")
+        output_dirs[out_dir] = job["name"]
+    return data
+
+
+def job_output_dir(job):
+    """Each job writes into <output>/<name>, with output defaulting to the current directory."""
+    return os.path.join(job.get("output", "."), job["name"])
+
+
+def parse_date(value):
+    """Parses an ISO date/datetime from the manifest into an aware UTC datetime (Telethon dates are UTC)."""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    dt = datetime.fromisoformat(str(value))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+async def resolve_chat_id(client, value):
+    """Returns the numeric peer ID for a chat ID or username, so every output refers to a chat the same way."""
+    if isinstance(value, int):
+        return value
+    if str(value).lstrip("-").isdigit():
+        return int(value)
+    try:
+        return await client.get_peer_id(value)
+    except Exception as e:
+        raise ManifestError(f"Cannot resolve target {value!r}: {e}")
+
+
+async def resolve_targets(client, spec, dialogs, templates):
+    """
+    Turns a job's 'targets' entry into a list of {'id', 'title', 'topic_id', 'topic_title'} dicts.
+    Accepts "all", {"template": name}, or a list of chat IDs / usernames / target objects.
+    """
+    titles = {d.id: d.title for d in dialogs}
+
+    if spec == "all":
+        return [{'id': d.id, 'title': d.title, 'topic_id': None, 'topic_title': None} for d in dialogs]
+
+    if isinstance(spec, dict) and "template" in spec:
+        name = spec["template"]
+        if name not in templates:
+            raise ManifestError(f"Template '{name}' not found for this account")
+        return [{'id': item['chat_id'], 'title': item['chat_title'], 'topic_id': item['topic_id'], 'topic_title': item['topic_title']}
+                for item in templates[name]]
+
+    if not isinstance(spec, list):
+        raise ManifestError("'targets' must be \"all\", {\"template\": name} or a list")
+
+    targets = []
+    for item in spec:
+        if isinstance(item, dict):
+            chat_id = await resolve_chat_id(client, item['id'])
+            targets.append({
+                'id': chat_id,
+                'title': item.get('title') or titles.get(chat_id, str(chat_id)),
+                'topic_id': item.get('topic_id'),
+                'topic_title': item.get('topic_title'),
+            })
+        else:
+            chat_id = await resolve_chat_id(client, item)
+            targets.append({'id': chat_id, 'title': titles.get(chat_id, str(item)), 'topic_id': None, 'topic_title': None})
+    return targets
+
+
+async def run_job(forwarder, job, dialogs, templates, semaphore, archiver=None):
+    """Runs one manifest job over the shared client. Returns its summary entry."""
+    name = job["name"]  # defaulted and validated by load_manifest
+    job_type = job["type"]
+    output_format = job.get("format", "txt")
+    output_dir = job_output_dir(job)
+    limit = job.get("limit") or None  # 0 or null means all history, like the interactive prompt
+    since = parse_date(job.get("since"))  # already validated by load_manifest
+    until = parse_date(job.get("until"))
+    media_archiver = archiver if job.get("media") else None
+
+    summary = {"name": name, "type": job_type, "status": "ok", "targets": 0, "messages": 0,
+               "failed_targets": [], "outputs": [], "duration": 0.0}
+    started = time.monotonic()
+
+    try:
+        targets = await resolve_targets(forwarder.client, job["targets"], dialogs, templates)
+    except (ManifestError, KeyError) as e:
+        summary.update(status="error", error=str(e))
+        return summary
+
+    summary["targets"] = len(targets)
+    os.makedirs(output_dir, exist_ok=True)
+
+    async def run_target(worker, t, file_handle=None):
+        async with metrics.slot(semaphore):
+            if job_type == "scrape":
+                return await worker.scrape_messages_to_file(
+                    t['id'], limit, t.get('topic_id'), chat_title=t['title'], topic_title=t.get('topic_title'),
+                    file_handle=file_handle, since=since, until=until, output_format=output_format, output_dir=output_dir,
+                    media_archiver=media_archiver)
+            return await worker.extract_data_from_chat(
+                t['id'], limit, t.get('topic_id'), chat_title=t['title'], topic_title=t.get('topic_title'),
+                since=since, until=until)
+
+    if job_type == "extract":
+        # Each extract job collects into its own result sets, but shares the connection
+        worker = TelegramForwarder(forwarder.api_id, forwarder.api_hash, forwarder.phone_number, client=forwarder.client)
+        counts = await asyncio.gather(*[run_target(worker, t) for t in targets])
+        worker.save_extracted_data(output_dir=output_dir, output_format=output_format)
+        names = ["all_results.json"] if output_format == "json" else ["links.txt", "domains.txt", "ips.txt", "all_results.txt"]
+        summary["outputs"] = [os.path.join(output_dir, n) for n in names]
+        summary["links"] = len(worker.unique_links)
+        summary["domains"] = len(worker.unique_domains)
+        summary["ips"] = len(worker.unique_ips)
+    elif job.get("merge"):
+        # A merged file is written sequentially so chats don't interleave
+        fname = os.path.join(output_dir, job.get("filename") or f"{name}.{output_format}")
+        with open(fname, "w", encoding="utf-8") as file_handle:
+            counts = [await run_target(forwarder, t, file_handle) for t in targets]
+        summary["outputs"] = [fname]
+    else:
+        counts = await asyncio.gather(*[run_target(forwarder, t) for t in targets])
+        summary["outputs"] = [output_dir]
+
+    for t, count in zip(targets, counts):
+        if count is None:
+            summary["failed_targets"].append(t['id'])
+        else:
+            summary["messages"] += count
+
+    if summary["failed_targets"]:
+        summary["status"] = "partial" if len(summary["failed_targets"]) < len(targets) else "error"
+    summary["duration"] = round(time.monotonic() - started, 3)
+    return summary
+
+
+async def run_manifest(manifest, account_phone=None, concurrency=None, metrics_file=None):
+    """Runs every job in a manifest from load_manifest() over a single authorized client. Returns the run summary dict."""
+    accounts = load_accounts()
+    if not accounts:
+        raise ManifestError("No accounts configured. Run MoonTele.py once to add an account.")
+
+    phone = account_phone or manifest.get("account")
+    account = next((a for a in accounts if a['phone'] == str(phone)), None) if phone else accounts[0]
+    if account is None:
+        raise ManifestError(f"Account {phone} not found in accounts.json")
+
+    forwarder = TelegramForwarder(account['api_id'], account['api_hash'], account['phone'])
+    budget = concurrency or manifest.get("concurrency") or DEFAULT_CONCURRENCY
+    semaphore = asyncio.Semaphore(budget)
+
+    started = time.monotonic()
+    archiver = None
+    async with monitoring(metrics_file or manifest.get("metrics_file")):
+        try:
+            # Headless: never prompt for a login code, the session must already be authorized
+            await forwarder.client.connect()
+            if not await forwarder.client.is_user_authorized():
+                raise ManifestError(f"Session for {account['phone']} is not authorized. Log in once with MoonTele.py.")
+
+            # One media store (and worker pool) is shared by every job with "media": true
+            media_cfg = manifest.get("media") or {}
+            if any(job.get("media") for job in manifest["jobs"]):
+                max_mb = media_cfg.get("max_size_mb")
+                archiver = MediaArchiver(forwarder.client, root=media_cfg.get("dir", "media"), workers=media_cfg.get("workers", 4),
+                                         max_size=int(max_mb * 1024 * 1024) if max_mb else None, types=media_cfg.get("types"))
+                await archiver.start()
+
+            # One dialog fetch warms the entity cache and serves every job's target lookup
+            dialogs = await forwarder.client.get_dialogs()
+            templates = load_templates(account['phone'])
+
+            # Jobs run concurrently; the semaphore caps in-flight chats across all of them.
+            # An unexpected error in one job is reported in its entry instead of discarding the others.
+            results = await asyncio.gather(*[
+                run_job(forwarder, job, dialogs, templates, semaphore, archiver)
+                for job in manifest["jobs"]
+            ], return_exceptions=True)
+            for i, (job, result) in enumerate(zip(manifest["jobs"], results)):
+                if isinstance(result, BaseException):
+                    if not isinstance(result, Exception):
+                        raise result
+                    results[i] = {"name": job["name"], "type": job["type"], "status": "error",
+                                  "error": f"{type(result).__name__}: {result}"}
+        finally:
+            # Always persist the media index, even when the run was aborted
+            if archiver:
+                await archiver.close()
+            await forwarder.client.disconnect()
+
+    return {
+        "account": account['phone'],
+        "concurrency": budget,
+        "status": "ok" if all(r["status"] == "ok" for r in results) else "failed",
+        "duration": round(time.monotonic() - started, 3),
+        "jobs": results,
+        "media": {**archiver.stats, "failed_keys": archiver.failed_keys} if archiver else None,
+        "metrics": metrics.snapshot(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run MoonTele scrape/extract jobs headlessly from a manifest.")
+    parser.add_argument("manifest", help="Path to a JSON or YAML job manifest")
+    parser.add_argument("--account", help="Phone number of the account to use (default: manifest 'account' or first account)")
+    parser.add_argument("--concurrency", type=int, help="Max chats processed at once across all jobs")
+    parser.add_argument("--summary", help="Also write the JSON summary to this file")
+    parser.add_argument("--metrics-file", help="Export metrics here while running (.prom for Prometheus text, else JSON)")
+    args = parser.parse_args()
+
+    # Progress output goes to stderr so stdout carries only the JSON summary
+    with redirect_stdout(sys.stderr):
+        try:
+            manifest = load_manifest(args.manifest)
+            summary = asyncio.run(run_manifest(manifest, args.account, args.concurrency, args.metrics_file))
+            exit_code = 0 if summary["status"] == "ok" else 1
+        except (ManifestError, OSError, ValueError) as e:
+            summary = {"status": "error", "error": str(e), "jobs": []}
+            exit_code = 2
+        except Exception as e:
+            # e.g. a Telethon RPCError from get_dialogs: callers still get a JSON summary
+            summary = {"status": "error", "error": f"{type(e).__name__}: {e}", "jobs": []}
+            exit_code = 2
+
+    output = json.dumps(summary, indent=2, ensure_ascii=False)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
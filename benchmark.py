@@ -0,0 +1,305 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import logging
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime, timezone, timedelta
+
+from telethon import errors
+
+from MoonTele import TelegramForwarder
+from metrics import metrics, watch_telethon_flood_waits, unwatch_telethon_flood_waits
+
+# resource is POSIX-only; the process peak RSS is reported as null elsewhere
+try:
+    import resource
+except ImportError:
+    resource = None
+
+WORDS = ("halo", "promo", "update", "info", "grup", "channel", "diskon", "gratis", "join", "cek",
+         "server", "download", "link", "terbaru", "hari", "ini", "admin", "member", "event", "bonus")
+TLDS = ("com", "net", "org", "io", "id", "co.id", "xyz", "dev")
+
+
+# --- Fake Telegram Client ---
+
+class FakeUser:
+    def __init__(self, user_id, first_name, last_name=None):
+        self.id = user_id
+        self.first_name = first_name
+        self.last_name = last_name
+
+
+class FakeMedia:
+    pass
+
+
+class FakeMessage:
+    def __init__(self, msg_id, date, sender, text, media=None):
+        self.id = msg_id
+        self.date = date
+        self.sender = sender
+        self.sender_id = sender.id
+        self.text = text
+        self.media = media
+        self.grouped_id = None
+
+
+class FakeTelegramClient:
+    """
+    Local stand-in for TelegramClient that serves synthetic history.
+    Mirrors Telethon's batching: messages are fetched in chunks of `batch_size`, each costing `latency`
+    seconds. After every `flood_every` served chunks a FloodWait window of `flood_seconds` opens, like Telegram's:
+    requests inside it are slept through when the remaining wait is within flood_sleep_threshold, or raised as
+    FloodWaitError otherwise, and the first request after it ends is served.
+    """
+    def __init__(self, histories, batch_size=100, latency=0.0, flood_every=0, flood_seconds=0, flood_sleep_threshold=60):
+        self.histories = histories
+        self.batch_size = batch_size
+        self.latency = latency
+        self.flood_every = flood_every
+        self.flood_seconds = flood_seconds
+        self.flood_sleep_threshold = flood_sleep_threshold
+        self.requests = 0
+        self.flood_waited = 0.0
+        self.served_since_flood = 0
+        self.flood_until = 0.0
+
+    async def connect(self):
+        pass
+
+    async def is_user_authorized(self):
+        return True
+
+    def is_connected(self):
+        return True
+
+    async def disconnect(self):
+        pass
+
+    async def _request(self):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        now = time.monotonic()
+        if self.flood_every and now >= self.flood_until and self.served_since_flood >= self.flood_every:
+            self.flood_until = now + self.flood_seconds
+            self.served_since_flood = 0
+        if now < self.flood_until:
+            remaining = self.flood_until - now
+            if remaining > self.flood_sleep_threshold:
+                raise errors.FloodWaitError(request=None, capture=max(1, round(remaining)))
+            # Telethon only reports the flood waits it sleeps through in this log record
+            logging.getLogger("telethon.client.users").info(
+                'Sleeping%s for %ds (%s) on %s flood wait', '', round(remaining), timedelta(seconds=round(remaining)), 'GetHistoryRequest')
+            self.flood_waited += remaining
+            await asyncio.sleep(remaining)
+        self.served_since_flood += 1
+
+    async def iter_messages(self, entity, limit=None, offset_date=None, offset_id=0, reply_to=None, **kwargs):
+        # History is stored newest-first, like Telegram returns it
+        history = self.histories.get(entity, [])
+        if offset_id:
+            history = [m for m in history if m.id < offset_id]
+        if offset_date:
+            history = [m for m in history if m.date < offset_date]
+        if limit:
+            history = history[:limit]
+
+        for start in range(0, len(history), self.batch_size):
+            await self._request()
+            for message in history[start:start + self.batch_size]:
+                yield message
+
+
+# --- Synthetic Data ---
+
+def make_text(rng, words, links, ips):
+    parts = [rng.choice(WORDS) for _ in range(words)]
+    for _ in range(links):
+        host = f"{rng.choice(WORDS)}{rng.randint(1, 500)}.{rng.choice(TLDS)}"
+        parts.insert(rng.randint(0, len(parts)), f"https://{host}/{rng.choice(WORDS)}?id={rng.randint(1, 99999)}")
+    for _ in range(ips):
+        parts.insert(rng.randint(0, len(parts)), ".".join(str(rng.randint(1, 254)) for _ in range(4)))
+    return " ".join(parts)
+
+
+def make_history(rng, count, media_ratio, long_ratio, entity_density, senders):
+    """
+    Builds `count` messages newest-first.
+    media_ratio: share of messages without text; long_ratio: share of long (~200 word) texts;
+    entity_density: average links+IPs per text message.
+    """
+    users = [FakeUser(1000 + i, f"User{i}", "Test" if i % 2 else None) for i in range(senders)]
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    history = []
+    for msg_id in range(count, 0, -1):
+        date = now + timedelta(seconds=msg_id * 30)
+        sender = rng.choice(users)
+        if rng.random() < media_ratio:
+            history.append(FakeMessage(msg_id, date, sender, "", FakeMedia()))
+            continue
+        words = rng.randint(150, 250) if rng.random() < long_ratio else rng.randint(3, 20)
+        entities = int(entity_density) + (1 if rng.random() < entity_density % 1 else 0)
+        links = sum(1 for _ in range(entities) if rng.random() < 0.8)
+        history.append(FakeMessage(msg_id, date, sender, make_text(rng, words, links, entities - links)))
+    return history
+
+
+# --- Measurement ---
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports kilobytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+async def measure(name, messages, coro_factory):
+    """
+    Runs one stage. With tracemalloc active, peak_kb is the stage's own peak of Python allocations above what
+    was already allocated when it started, and retained_kb is what it left allocated (ru_maxrss can't do this:
+    it is the lifetime peak of the whole process).
+    """
+    metrics.reset()
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        mem_start = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    result = await coro_factory()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    mem_end, mem_peak = tracemalloc.get_traced_memory() if tracing else (None, None)
+    return {
+        "stage": name,
+        "messages": messages,
+        "wall_seconds": round(wall, 4),
+        "cpu_seconds": round(cpu, 4),
+        "messages_per_sec": round(messages / wall, 1) if wall > 0 and messages else None,
+        "peak_kb": (mem_peak - mem_start) // 1024 if tracing else None,
+        "retained_kb": (mem_end - mem_start) // 1024 if tracing else None,
+        "metrics": metrics.snapshot(),
+    }, result
+
+
+async def run_benchmark(args):
+    # Tracing starts before the synthetic histories exist so their size is measured separately from the stages
+    if args.trace_memory:
+        tracemalloc.start()
+    rng = random.Random(args.seed)
+    chat_ids = [-1001000000000 - i for i in range(args.chats)]
+    histories = {cid: make_history(rng, args.messages, args.media_ratio, args.long_ratio, args.entity_density, args.senders)
+                 for cid in chat_ids}
+    total = args.messages * args.chats
+    history_kb = tracemalloc.get_traced_memory()[0] // 1024 if args.trace_memory else None
+
+    client = FakeTelegramClient(histories, latency=args.latency, flood_every=args.flood_every,
+                                flood_seconds=args.flood_seconds, flood_sleep_threshold=args.flood_threshold)
+    forwarder = TelegramForwarder(0, "", "benchmark", client=client)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    stages = []
+
+    # The fake logs slept-through flood waits like Telethon, so stage metrics count them too
+    flood_watch = watch_telethon_flood_waits(metrics)
+    try:
+        with tempfile.TemporaryDirectory() as out_dir, open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            for fmt in args.formats:
+                async def scrape_all():
+                    async def one(cid):
+                        async with semaphore:
+                            return await forwarder.scrape_messages_to_file(cid, chat_title=f"bench {cid}", output_format=fmt, output_dir=out_dir)
+                    return await asyncio.gather(*[one(cid) for cid in chat_ids])
+                stage, _ = await measure(f"scrape_{fmt}", total, scrape_all)
+                stages.append(stage)
+
+            async def extract_all():
+                async def one(cid):
+                    async with semaphore:
+                        return await forwarder.extract_data_from_chat(cid)
+                return await asyncio.gather(*[one(cid) for cid in chat_ids])
+            stage, _ = await measure("extract", total, extract_all)
+            stages.append(stage)
+
+            async def save():
+                forwarder.save_extracted_data(output_dir=out_dir)
+            stage, _ = await measure("save_extracted", total, save)
+            stage["unique_items"] = len(forwarder.unique_links) + len(forwarder.unique_domains) + len(forwarder.unique_ips)
+            stages.append(stage)
+    finally:
+        unwatch_telethon_flood_waits(flood_watch)
+
+    if args.trace_memory:
+        tracemalloc.stop()
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "history_kb": history_kb,
+        "process_peak_rss_kb": peak_rss_kb(),
+        "fake_requests": client.requests,
+        "flood_wait_seconds": client.flood_waited,
+        "stages": stages,
+    }
+
+
+def compare(current, baseline):
+    """Prints per-stage throughput change against a previous benchmark JSON."""
+    old = {s["stage"]: s for s in baseline.get("stages", [])}
+    if current["config"].get("trace_memory") != baseline.get("config", {}).get("trace_memory", False):
+        print("⚠️ Only one of the reports traced memory; tracemalloc overhead makes msg/s incomparable.", file=sys.stderr)
+    print(f"{'stage':<16}{'msg/s (old)':>14}{'msg/s (new)':>14}{'change':>10}", file=sys.stderr)
+    for stage in current["stages"]:
+        prev = old.get(stage["stage"])
+        new_rate = stage["messages_per_sec"]
+        old_rate = prev["messages_per_sec"] if prev else None
+        change = f"{(new_rate / old_rate - 1) * 100:+.1f}%" if new_rate and old_rate else "n/a"
+        print(f"{stage['stage']:<16}{str(old_rate):>14}{str(new_rate):>14}{change:>10}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline scrape/extract benchmark using a fake Telegram client.")
+    parser.add_argument("--messages", type=int, default=20000, help="Messages per chat")
+    parser.add_argument("--chats", type=int, default=1, help="Number of synthetic chats")
+    parser.add_argument("--senders", type=int, default=50, help="Distinct senders per chat")
+    parser.add_argument("--media-ratio", type=float, default=0.2, help="Share of media-only (no text) messages")
+    parser.add_argument("--long-ratio", type=float, default=0.1, help="Share of long (~200 word) messages")
+    parser.add_argument("--entity-density", type=float, default=1.0, help="Average links/IPs per text message")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per 100-message fetch")
+    parser.add_argument("--flood-every", type=int, default=0, help="Open a FloodWait window after every N served fetches (0 = never)")
+    parser.add_argument("--flood-seconds", type=int, default=1, help="FloodWait duration")
+    parser.add_argument("--flood-threshold", type=int, default=60, help="Client flood_sleep_threshold")
+    parser.add_argument("--concurrency", type=int, default=5, help="Chats processed at once")
+    parser.add_argument("--formats", nargs="+", default=["txt", "jsonl"], choices=["txt", "jsonl"], help="Scrape output formats to benchmark")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-trace-memory", dest="trace_memory", action="store_false",
+                        help="Skip per-stage memory tracing (tracemalloc slows every stage down)")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Previous JSON report to compare throughput against")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmark(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
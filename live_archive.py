@@ -0,0 +1,311 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from datetime import datetime, timezone
+
+from telethon import events, errors
+
+from MoonTele import TelegramForwarder, load_accounts, load_templates
+from metrics import metrics, monitoring
+from media_archive import MediaArchiver
+
+CHECKPOINT_FILE = "checkpoint.json"
+# How many (chat, message) edit dates are remembered to drop repeated edit updates
+EDIT_CACHE_SIZE = 10000
+
+
+def topic_of(message):
+    """Returns the forum topic ID a message was posted in, if any."""
+    reply = message.reply_to
+    if reply and getattr(reply, 'forum_topic', False):
+        return reply.reply_to_top_id or reply.reply_to_msg_id
+    return None
+
+
+class LiveArchiver:
+    """
+    Keeps per-chat JSON Lines archives (<output>/<chat_id>.jsonl) current from new-message, edit and delete updates.
+    Records are buffered and appended in batches. The checkpoint holds, per chat, the ID up to which history is known
+    to be complete plus the IDs archived live above it; it is saved after every flush and used to backfill whatever
+    was missed while offline or disconnected.
+    """
+    def __init__(self, forwarder, chats, output="archive", batch_size=200, flush_interval=5.0, resync_interval=300.0, media_archiver=None):
+        self.forwarder = forwarder
+        self.client = forwarder.client
+        self.chats = chats
+        self.output = output
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.resync_interval = resync_interval
+        self.media_archiver = media_archiver
+
+        self.titles = {}
+        self.buffer = {}
+        self.buffered = 0
+        self.checkpoint_path = os.path.join(output, CHECKPOINT_FILE)
+        # last_ids only advances during backfill, which walks history without holes.
+        # Live messages can arrive out of order around a gap, so they are tracked in `seen` until then.
+        self.last_ids = {}
+        self.seen = {}
+        self.edit_dates = {}
+        os.makedirs(output, exist_ok=True)
+
+        if os.path.exists(self.checkpoint_path):
+            try:
+                with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                    for chat_id, state in json.load(f).items():
+                        self.last_ids[int(chat_id)] = state["last_id"]
+                        self.seen[int(chat_id)] = set(state.get("seen", []))
+            except Exception as e:
+                print(f"Error loading checkpoint, gaps will not be backfilled: {e}")
+
+    # --- Buffering ---
+
+    def _append(self, chat_id, record):
+        self.buffer.setdefault(chat_id, []).append(json.dumps(record, ensure_ascii=False) + "\n")
+        self.buffered += 1
+        metrics.add_gauge("live_buffered", 1)
+        if self.buffered >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Appends buffered records with one write per chat, then persists the checkpoint."""
+        if not self.buffered:
+            return
+        started = time.perf_counter()
+        for chat_id, lines in self.buffer.items():
+            with open(os.path.join(self.output, f"{chat_id}.jsonl"), "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+        metrics.inc("write_seconds_total", time.perf_counter() - started)
+        metrics.inc("live_flushes_total")
+        metrics.add_gauge("live_buffered", -self.buffered)
+        self.buffer = {}
+        self.buffered = 0
+        self.save_checkpoint()
+
+    def save_checkpoint(self):
+        tmp_path = self.checkpoint_path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({str(k): {"last_id": v, "seen": sorted(self.seen.get(k, ()))} for k, v in self.last_ids.items()}, f, indent=1)
+            os.replace(tmp_path, self.checkpoint_path)
+        except Exception as e:
+            print(f"Error saving checkpoint: {e}")
+
+    async def _record_message(self, chat_id, message, event):
+        if event == "new":
+            # Backfill and live updates overlap, so each message is archived once
+            seen = self.seen.setdefault(chat_id, set())
+            if message.id <= self.last_ids.get(chat_id, 0) or message.id in seen:
+                return
+            seen.add(message.id)
+
+        sender = self.forwarder._format_sender(message)
+        media_key = await self.media_archiver.submit(message) if self.media_archiver and message.media else None
+        record = self.forwarder._message_record(message, chat_id, self.titles.get(chat_id), topic_of(message), sender, media_key)
+        record["event"] = event
+        if event == "edit" and message.edit_date:
+            record["edit_date"] = message.edit_date.isoformat()
+        self._append(chat_id, record)
+        metrics.inc("live_events_total")
+
+    # --- Update handlers ---
+
+    async def on_new(self, event):
+        await self._record_message(event.chat_id, event.message, "new")
+
+    async def on_edit(self, event):
+        # Poll votes, reactions etc. also arrive as MessageEdited; only a new edit_date is a real edit
+        message = event.message
+        key = (event.chat_id, message.id)
+        if message.edit_date is None or self.edit_dates.get(key) == message.edit_date:
+            return
+        self.edit_dates.pop(key, None)
+        self.edit_dates[key] = message.edit_date
+        if len(self.edit_dates) > EDIT_CACHE_SIZE:
+            del self.edit_dates[next(iter(self.edit_dates))]
+        await self._record_message(event.chat_id, message, "edit")
+
+    async def on_delete(self, event):
+        # Telegram only says which chat a deletion belongs to for channels and supergroups
+        if event.chat_id is None:
+            return
+        now = datetime.now(timezone.utc).isoformat()
+        for msg_id in event.deleted_ids:
+            self._append(event.chat_id, {"chat_id": event.chat_id, "chat_title": self.titles.get(event.chat_id),
+                                         "id": msg_id, "date": now, "event": "delete"})
+        metrics.inc("live_events_total", len(event.deleted_ids))
+
+    # --- Backfill ---
+
+    async def backfill(self):
+        """Archives messages newer than the checkpoint for every chat (oldest first)."""
+        for chat_id in self.chats:
+            last_id = self.last_ids.get(chat_id)
+            try:
+                if last_id is None:
+                    # New chat: the live archive starts here (use scrape/batch_runner for older history)
+                    latest = await self.client.get_messages(chat_id, limit=1)
+                    self.last_ids[chat_id] = latest[0].id if latest else 0
+                    continue
+
+                count = 0
+                seen = self.seen.setdefault(chat_id, set())
+                async for message in self.client.iter_messages(chat_id, min_id=last_id, reverse=True):
+                    if message.id not in seen:
+                        count += 1
+                    await self._record_message(chat_id, message, "new")
+                    last_id = message.id
+
+                # Everything up to last_id is now archived, so live IDs below it no longer need tracking
+                self.last_ids[chat_id] = last_id
+                self.seen[chat_id] = {i for i in seen if i > last_id}
+                if count:
+                    metrics.inc("live_backfilled_total", count)
+                    print(f"Backfilled {count} messages in {self.titles.get(chat_id, chat_id)}")
+            except errors.FloodWaitError as e:
+                print(f"FloodWait of {e.seconds}s while backfilling {chat_id}, retrying on next resync")
+                metrics.inc("flood_waits_total")
+                metrics.inc("flood_wait_seconds_total", e.seconds)
+            except Exception as e:
+                print(f"Backfill failed for {chat_id}: {e}")
+        self.flush()
+        self.save_checkpoint()
+
+    # --- Main loop ---
+
+    async def run(self):
+        dialogs = await self.client.get_dialogs()
+        self.titles = {d.id: d.title for d in dialogs}
+
+        self.client.add_event_handler(self.on_new, events.NewMessage(chats=self.chats))
+        self.client.add_event_handler(self.on_edit, events.MessageEdited(chats=self.chats))
+        self.client.add_event_handler(self.on_delete, events.MessageDeleted(chats=self.chats))
+
+        await self.backfill()
+        print(f"📡 Live archiving {len(self.chats)} chats to {self.output}/ (Ctrl+C to stop)")
+
+        last_resync = time.monotonic()
+        retry_delay = 5
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+            if not self.client.is_connected():
+                # Telethon gave up reconnecting on its own: reconnect, then close the gap from the checkpoint
+                print("⚠️ Disconnected, reconnecting...")
+                try:
+                    await self.client.connect()
+                except Exception as e:
+                    print(f"Reconnect failed: {e}")
+                    await asyncio.sleep(retry_delay)
+                    retry_delay = min(retry_delay * 2, 300)
+                    continue
+                retry_delay = 5
+                await self.backfill()
+                last_resync = time.monotonic()
+            elif time.monotonic() - last_resync >= self.resync_interval:
+                # Cheap safety net for updates lost during Telethon's silent reconnects
+                await self.backfill()
+                last_resync = time.monotonic()
+
+
+def resolve_chats(values, template, templates):
+    chats = []
+    for value in values:
+        chats.append(int(value) if value.lstrip("-").isdigit() else value)
+    if template:
+        if template not in templates:
+            raise ValueError(f"Template '{template}' not found for this account")
+        chats.extend(item['chat_id'] for item in templates[template])
+    return list(dict.fromkeys(chats))
+
+
+async def main_async(args):
+    accounts = load_accounts()
+    if not accounts:
+        print("❌ No accounts configured. Run MoonTele.py once to add an account.")
+        return 2
+    account = next((a for a in accounts if a['phone'] == args.account), None) if args.account else accounts[0]
+    if account is None:
+        print(f"❌ Account {args.account} not found in accounts.json")
+        return 2
+
+    forwarder = TelegramForwarder(account['api_id'], account['api_hash'], account['phone'])
+    await forwarder.client.connect()
+    if not await forwarder.client.is_user_authorized():
+        print(f"❌ Session for {account['phone']} is not authorized. Log in once with MoonTele.py.")
+        await forwarder.client.disconnect()
+        return 2
+
+    try:
+        chats = resolve_chats(args.chats, args.template, load_templates(account['phone']))
+    except ValueError as e:
+        print(f"❌ {e}")
+        await forwarder.client.disconnect()
+        return 2
+    if not chats:
+        print("❌ No chats given. Pass chat IDs/usernames or --template.")
+        await forwarder.client.disconnect()
+        return 2
+
+    # Usernames are resolved once so update filters and the archive use numeric chat IDs
+    chat_ids = []
+    for chat in chats:
+        try:
+            chat_ids.append(chat if isinstance(chat, int) else await forwarder.client.get_peer_id(chat))
+        except Exception as e:
+            print(f"❌ Cannot resolve {chat!r}: {e}")
+            await forwarder.client.disconnect()
+            return 2
+
+    media_archiver = None
+    if args.media:
+        media_archiver = MediaArchiver(forwarder.client, root=args.media_dir,
+                                       max_size=int(args.media_max_mb * 1024 * 1024) if args.media_max_mb else None,
+                                       types=args.media_types)
+        await media_archiver.start()
+
+    archiver = LiveArchiver(forwarder, chat_ids, output=args.output, batch_size=args.batch_size,
+                            flush_interval=args.flush_interval, resync_interval=args.resync_interval,
+                            media_archiver=media_archiver)
+    async with monitoring(args.metrics_file):
+        try:
+            await archiver.run()
+        finally:
+            archiver.flush()
+            archiver.save_checkpoint()
+            if media_archiver:
+                await media_archiver.close()
+            await forwarder.client.disconnect()
+            print("💾 Archive flushed and checkpoint saved.")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Continuously archive new, edited and deleted messages from chosen chats.")
+    parser.add_argument("chats", nargs="*", help="Chat IDs or usernames to archive")
+    parser.add_argument("--template", help="Also archive every chat in this target template")
+    parser.add_argument("--account", help="Phone number of the account to use (default: first account)")
+    parser.add_argument("--output", default="archive", help="Archive directory (default: archive)")
+    parser.add_argument("--batch-size", type=int, default=200, help="Flush after this many buffered records")
+    parser.add_argument("--flush-interval", type=float, default=5.0, help="Flush at least every N seconds")
+    parser.add_argument("--resync-interval", type=float, default=300.0, help="Backfill from the checkpoint every N seconds")
+    parser.add_argument("--media", action="store_true", help="Also archive attachments (see media_archive.py)")
+    parser.add_argument("--media-dir", default="media")
+    parser.add_argument("--media-max-mb", type=float)
+    parser.add_argument("--media-types", nargs="+")
+    parser.add_argument("--metrics-file", help="Export metrics here while running (.prom or .json)")
+    args = parser.parse_args()
+
+    try:
+        sys.exit(asyncio.run(main_async(args)))
+    except KeyboardInterrupt:
+        print("\n👋 Stopped.")
+
+
+if __name__ == "__main__":
+    main()
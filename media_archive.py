@@ -0,0 +1,188 @@
+import os
+import json
+import asyncio
+import hashlib
+import time
+
+from metrics import metrics
+
+MEDIA_TYPES = ("photo", "sticker", "gif", "video", "voice", "audio", "document")
+INDEX_FILE = "index.json"
+HASH_CHUNK = 1024 * 1024
+
+
+def media_info(message):
+    """
+    Returns (kind, file_key, size, ext) for a downloadable attachment, or None.
+    file_key is built from Telegram's own photo/document ID, so the same upload keeps the same key across chats.
+    """
+    file = getattr(message, 'file', None)
+    if not message.media or file is None:
+        return None
+
+    kind = next((k for k in MEDIA_TYPES if getattr(message, k, None)), None)
+    if kind is None:
+        return None
+
+    obj = message.photo if kind == "photo" else message.document
+    if obj is None:
+        return None
+    key = f"{'photo' if kind == 'photo' else 'doc'}_{obj.id}"
+    return kind, key, file.size, file.ext or ""
+
+
+class MediaArchiver:
+    """
+    Downloads scraped attachments through a bounded worker pool into a content-addressed store:
+    <root>/<sha256[:2]>/<sha256><ext>. index.json maps Telegram file keys to stored files, so attachments
+    already on disk are skipped before downloading and identical content reposted under a new ID is kept once.
+    Keys whose download failed are listed under "failed" in the index (and in failed_keys for this run) until a
+    later run archives them.
+    """
+    def __init__(self, client, root="media", workers=4, max_size=None, types=None, queue_size=100):
+        self.client = client
+        self.root = root
+        self.workers = workers
+        self.max_size = max_size
+        self.types = set(types) if types else None
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.index_path = os.path.join(root, INDEX_FILE)
+        self.index = {"files": {}, "hashes": {}, "failed": {}}
+        self.pending = set()
+        self.failed_keys = []
+        self.tasks = []
+        self.stats = {"downloaded": 0, "deduplicated": 0, "skipped": 0, "filtered": 0, "failed": 0, "bytes": 0}
+
+        os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self.index = json.load(f)
+                self.index.setdefault("failed", {})
+            except Exception as e:
+                print(f"Error loading media index, starting fresh: {e}")
+
+    async def start(self):
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self):
+        """Waits for queued downloads to finish, stops the workers and saves the index."""
+        await self.queue.join()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        self.save_index()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def is_archived(self, key, size):
+        entry = self.index["files"].get(key)
+        if not entry:
+            return False
+        path = os.path.join(self.root, entry["path"])
+        return os.path.exists(path) and (size is None or entry["size"] == size)
+
+    async def submit(self, message):
+        """
+        Queues the message's attachment for download (waiting if the queue is full).
+        Returns its file key if it is archived or queued, None if there is nothing to archive or it was filtered out.
+        """
+        info = media_info(message)
+        if info is None:
+            return None
+        kind, key, size, ext = info
+
+        if (self.types and kind not in self.types) or (self.max_size and size and size > self.max_size):
+            self.stats["filtered"] += 1
+            return None
+
+        if key in self.pending or self.is_archived(key, size):
+            self.stats["skipped"] += 1
+            metrics.inc("media_skipped_total")
+            return key
+
+        self.pending.add(key)
+        await self.queue.put((message, key, kind, size, ext))
+        metrics.add_gauge("media_queue_depth", 1)
+        return key
+
+    async def _worker(self):
+        while True:
+            item = await self.queue.get()
+            metrics.add_gauge("media_queue_depth", -1)
+            try:
+                await self._download(*item)
+            except Exception as e:
+                # The scrape output already references the key, so keep it visible for a retry
+                key = item[1]
+                self.stats["failed"] += 1
+                metrics.inc("media_failed_total")
+                self.failed_keys.append(key)
+                self.index["failed"][key] = {"kind": item[2], "error": f"{type(e).__name__}: {e}", "time": time.time()}
+                print(f"Failed to download media {key}: {e}")
+            finally:
+                self.pending.discard(item[1])
+                self.queue.task_done()
+
+    async def _download(self, message, key, kind, size, ext):
+        tmp_path = os.path.join(self.root, "tmp", f"{key}{ext}")
+        started = time.perf_counter()
+        try:
+            await self.client.download_media(message, file=tmp_path)
+            metrics.inc("media_download_seconds_total", time.perf_counter() - started)
+
+            # Hashing large files would stall the event loop, so it runs in a thread
+            digest = await asyncio.to_thread(self._sha256, tmp_path)
+            actual_size = os.path.getsize(tmp_path)
+        except BaseException:
+            # Never leave a partial download behind (also on cancellation)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        rel_path = os.path.join(digest[:2], digest + ext)
+        final_path = os.path.join(self.root, rel_path)
+
+        if digest in self.index["hashes"] and os.path.exists(os.path.join(self.root, self.index["hashes"][digest])):
+            # Same content under another Telegram ID (e.g. re-uploaded in another chat)
+            os.remove(tmp_path)
+            rel_path = self.index["hashes"][digest]
+            self.stats["deduplicated"] += 1
+            metrics.inc("media_deduplicated_total")
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+            self.index["hashes"][digest] = rel_path
+            self.stats["downloaded"] += 1
+            self.stats["bytes"] += actual_size
+            metrics.inc("media_downloads_total")
+            metrics.inc("media_bytes_total", actual_size)
+
+        self.index["files"][key] = {"sha256": digest, "path": rel_path, "size": size if size is not None else actual_size, "kind": kind}
+        self.index["failed"].pop(key, None)
+
+        # Persist periodically so an interrupted run doesn't re-download everything
+        if (self.stats["downloaded"] + self.stats["deduplicated"]) % 50 == 0:
+            self.save_index()
+
+    @staticmethod
+    def _sha256(path):
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def save_index(self):
+        tmp_path = self.index_path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f, indent=1)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            print(f"Error saving media index: {e}")
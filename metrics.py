@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from rich.table import Table
+
+# name -> (type, help). Every metric is always exported, starting at zero.
+METRIC_DEFS = {
+    "scrape_messages_total": ("counter", "Messages written by scrape"),
+    "extract_messages_total": ("counter", "Messages scanned by extract"),
+    "fetch_batch_seconds": ("summary", "Wall time awaiting Telegram per 100-message fetch batch"),
+    "flood_waits_total": ("counter", "FloodWait events (slept by Telethon or resumed by MoonTele)"),
+    "flood_wait_seconds_total": ("counter", "Seconds spent in FloodWait"),
+    "extract_cpu_seconds_total": ("counter", "CPU seconds spent extracting links/domains/IPs (event-loop thread only)"),
+    "write_seconds_total": ("counter", "Wall seconds spent writing scrape output"),
+    "targets_pending": ("gauge", "Chats queued behind the concurrency limit"),
+    "targets_active": ("gauge", "Chats currently being processed"),
+    "media_downloads_total": ("counter", "Media files downloaded and stored"),
+    "media_bytes_total": ("counter", "Bytes of media stored"),
+    "media_deduplicated_total": ("counter", "Downloads discarded because identical content was already stored"),
+    "media_skipped_total": ("counter", "Media skipped because the Telegram file was already archived or queued"),
+    "media_download_seconds_total": ("counter", "Wall seconds spent downloading media"),
+    "media_failed_total": ("counter", "Media downloads that failed (listed under 'failed' in the media index)"),
+    "media_queue_depth": ("gauge", "Media downloads waiting for a worker"),
+    "live_events_total": ("counter", "New/edit/delete records captured by live archiving"),
+    "live_backfilled_total": ("counter", "Messages recovered from the checkpoint after a gap"),
+    "live_flushes_total": ("counter", "Batched archive writes"),
+    "live_buffered": ("gauge", "Live archive records waiting to be written"),
+}
+
+PREFIX = "moontele_"
+
+
+class Metrics:
+    """In-process counters, gauges and summaries (count/sum/max) for the scrape/extract hot paths."""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.values = {}
+        self.summaries = {}
+        for name, (kind, _) in METRIC_DEFS.items():
+            if kind == "summary":
+                self.summaries[name] = {"count": 0, "sum": 0.0, "max": 0.0}
+            else:
+                self.values[name] = 0
+        self.started = time.time()
+
+    def inc(self, name, amount=1):
+        self.values[name] = self.values.get(name, 0) + amount
+
+    def add_gauge(self, name, amount):
+        self.inc(name, amount)
+
+    def observe(self, name, value):
+        s = self.summaries.setdefault(name, {"count": 0, "sum": 0.0, "max": 0.0})
+        s["count"] += 1
+        s["sum"] += value
+        s["max"] = max(s["max"], value)
+
+    @asynccontextmanager
+    async def slot(self, semaphore):
+        """Acquires a concurrency slot while tracking how many chats wait for one and how many hold one."""
+        self.add_gauge("targets_pending", 1)
+        try:
+            await semaphore.acquire()
+        finally:
+            self.add_gauge("targets_pending", -1)
+        self.add_gauge("targets_active", 1)
+        try:
+            yield
+        finally:
+            self.add_gauge("targets_active", -1)
+            semaphore.release()
+
+    def snapshot(self):
+        return {
+            "timestamp": time.time(),
+            "uptime_seconds": round(time.time() - self.started, 3),
+            "values": {k: round(v, 6) if isinstance(v, float) else v for k, v in self.values.items()},
+            "summaries": {k: {"count": s["count"], "sum": round(s["sum"], 6), "max": round(s["max"], 6)}
+                          for k, s in self.summaries.items()},
+        }
+
+    def to_prometheus(self):
+        lines = []
+        for name, value in self.values.items():
+            kind, help_text = METRIC_DEFS.get(name, ("gauge", name))
+            lines.append(f"# HELP {PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+            lines.append(f"{PREFIX}{name} {value}")
+        for name, s in self.summaries.items():
+            _, help_text = METRIC_DEFS.get(name, ("summary", name))
+            lines.append(f"# HELP {PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}{name} summary")
+            lines.append(f"{PREFIX}{name}_sum {s['sum']}")
+            lines.append(f"{PREFIX}{name}_count {s['count']}")
+            lines.append(f"# TYPE {PREFIX}{name}_max gauge")
+            lines.append(f"{PREFIX}{name}_max {s['max']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Writes a Prometheus text file (.prom) or JSON snapshot (any other extension) atomically."""
+        content = self.to_prometheus() if path.endswith(".prom") else json.dumps(self.snapshot(), indent=2) + "\n"
+        # node_exporter may read at any moment, so never expose a half-written file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def rich_table(self):
+        table = Table(title="📊 Live Metrics", box=None, padding=(0, 1))
+        table.add_column("Metric", style="cyan")
+        table.add_column("Value", justify="right", style="green")
+
+        v = self.values
+        fetch = self.summaries["fetch_batch_seconds"]
+        avg_fetch = fetch["sum"] / fetch["count"] if fetch["count"] else 0.0
+        table.add_row("Messages scraped / scanned", f"{v['scrape_messages_total']} / {v['extract_messages_total']}")
+        table.add_row("Fetch batches (avg / max)", f"{fetch['count']} ({avg_fetch:.2f}s / {fetch['max']:.2f}s)")
+        table.add_row("Network wait", f"{fetch['sum']:.1f}s")
+        table.add_row("FloodWait", f"{v['flood_waits_total']}x, {v['flood_wait_seconds_total']:.0f}s")
+        table.add_row("Extract CPU", f"{v['extract_cpu_seconds_total']:.2f}s")
+        table.add_row("Disk write", f"{v['write_seconds_total']:.2f}s")
+        table.add_row("Chats active / queued", f"{v['targets_active']} / {v['targets_pending']}")
+        table.add_row("Media saved / deduped / skipped / failed", f"{v['media_downloads_total']} / {v['media_deduplicated_total']} / {v['media_skipped_total']} / {v['media_failed_total']}")
+        table.add_row("Media queue / bytes", f"{v['media_queue_depth']} / {v['media_bytes_total'] / 1048576:.1f} MB")
+        return table
+
+
+class _FloodWaitLogHandler(logging.Handler):
+    """Counts flood waits that Telethon sleeps through internally (it only logs them)."""
+    def __init__(self, target):
+        super().__init__(logging.INFO)
+        self.target = target
+
+    def emit(self, record):
+        # Telethon logs: 'Sleeping%s for %ds (%s) on %s flood wait'
+        if "flood wait" in str(record.msg) and isinstance(record.args, tuple) and len(record.args) >= 2:
+            self.target.inc("flood_waits_total")
+            self.target.inc("flood_wait_seconds_total", record.args[1])
+
+
+FLOOD_WAIT_LOGGER = "telethon.client.users"
+
+
+def watch_telethon_flood_waits(target):
+    """
+    Starts counting the flood waits Telethon sleeps through itself, which it only reports as INFO log records.
+    Side effect: until unwatch_telethon_flood_waits() runs, the "telethon.client.users" logger is lowered to INFO
+    (if it was quieter), so those flood-wait lines also reach any handlers the application put on the root logger.
+    Returns the installed handler, or None if one is already installed.
+    """
+    logger = logging.getLogger(FLOOD_WAIT_LOGGER)
+    if any(isinstance(h, _FloodWaitLogHandler) for h in logger.handlers):
+        return None
+    handler = _FloodWaitLogHandler(target)
+    handler.previous_level = logger.level
+    logger.addHandler(handler)
+    if logger.getEffectiveLevel() > logging.INFO:
+        logger.setLevel(logging.INFO)
+    return handler
+
+
+def unwatch_telethon_flood_waits(handler):
+    """Removes the handler and restores the logger level it replaced."""
+    if handler is None:
+        return
+    logger = logging.getLogger(FLOOD_WAIT_LOGGER)
+    logger.removeHandler(handler)
+    logger.setLevel(handler.previous_level)
+
+
+async def _export_loop(target, path, interval):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            target.write(path)
+        except OSError as e:
+            print(f"Error writing metrics to {path}: {e}")
+
+
+def start_exporter(path=None, interval=None):
+    """
+    Periodically writes metrics to `path` (default: $MOONTELE_METRICS_FILE) every `interval` seconds
+    (default: $MOONTELE_METRICS_INTERVAL or 10). Returns the background task, or None if no path is set.
+    """
+    path = path or os.environ.get("MOONTELE_METRICS_FILE")
+    if not path:
+        return None
+    interval = interval or float(os.environ.get("MOONTELE_METRICS_INTERVAL", 10))
+    metrics.write(path)
+    task = asyncio.create_task(_export_loop(metrics, path, interval))
+    task.metrics_path = path
+    return task
+
+
+async def stop_exporter(task):
+    """Stops the exporter task and writes a final snapshot."""
+    if task is None:
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    metrics.write(task.metrics_path)
+
+
+@asynccontextmanager
+async def monitoring(path=None, interval=None):
+    """
+    Entry-point wrapper: exports metrics (see start_exporter) and counts Telethon's slept-through flood waits
+    (see watch_telethon_flood_waits) for the duration of the block, then writes a final snapshot and undoes both.
+    """
+    exporter = start_exporter(path, interval)
+    flood_watch = watch_telethon_flood_waits(metrics)
+    try:
+        yield exporter
+    finally:
+        unwatch_telethon_flood_waits(flood_watch)
+        await stop_exporter(exporter)
+
+
+# Shared registry used by TelegramForwarder and the CLIs
+metrics = Metrics()